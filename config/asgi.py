@@ -8,10 +8,18 @@ django.setup()
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 import rooms.routing
+import game.routing
+from rooms import redis_pool
+from rooms.jwt_ws_middleware import JWTQueryAuthMiddleware
 
 django_asgi_app = get_asgi_application()
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
-    "websocket": URLRouter(rooms.routing.websocket_urlpatterns),
+    "lifespan": redis_pool.lifespan,  # Redis 풀 생성/정리 (lifespan 을 지원하는 서버에서)
+    # ?token=<access> → scope["user"] (검증 결과는 캐시, rooms/jwt_ws_middleware.py)
+    "websocket": JWTQueryAuthMiddleware(URLRouter(
+        rooms.routing.websocket_urlpatterns
+        + game.routing.websocket_urlpatterns
+    )),
 })
\ No newline at end of file
@@ -54,6 +54,75 @@ CHANNEL_LAYERS = {
 }
 REDIS_URL = "redis://127.0.0.1:6379/0"
 
+# presence / 퍼블리셔 슬롯용 공용 Redis 풀 (rooms/redis_pool.py, 이벤트 루프당 하나)
+REDIS_POOL = {
+    "MAX_CONNECTIONS": 50,
+    "TIMEOUT": 5,
+    "SOCKET_TIMEOUT": 5,
+    "CONNECT_TIMEOUT": 2,
+    "HEALTH_CHECK_INTERVAL": 30,
+}
+
+# 스트림 뷰어 기본 전송 모드 (latest: 최신 프레임만 유지, all: 전부 순서대로)
+STREAM_DELIVERY = "latest"
+
+# ?ack=1 뷰어에게 ack 없이 보낼 수 있는 최대 프레임 수 (넘으면 최신 프레임만 남기고 대기)
+STREAM_MAX_INFLIGHT = 2
+
+# 채널 레이어로 보낼 때 이보다 큰 프레임은 조각내서 전송 (bytes)
+STREAM_CHUNK_BYTES = 256 * 1024
+
+# 늦게 들어온 뷰어용 스트림별 키프레임 버퍼 한도 (bytes)
+STREAM_RING_BYTES = 4 * 1024 * 1024
+
+# 서버 측 타일 델타 인코딩 (numpy + Pillow 필요, game/delta.py 참고)
+STREAM_DELTA = {
+    "ENABLED": False,
+    "TILE": 32,
+    "KEYFRAME_INTERVAL": 30,
+}
+
+# 스트림 녹화 (퍼블리셔가 ?record=1 로 접속하면 세그먼트 파일로 저장, game/recorder.py 참고)
+STREAM_RECORDING = {
+    "ENABLED": False,
+    "DIR": BASE_DIR / "recordings",
+    "SEGMENT_BYTES": 64 * 1024 * 1024,
+}
+
+# 뷰어별 자동 화질 단계 (full/half/low, Pillow 필요, game/ladder.py 참고)
+STREAM_LADDER = {
+    "ENABLED": False,
+    "WORKERS": 2,
+}
+
+# 방 presence 프로토콜 기본값 (delta: member_joined/member_left 증분, count: 기존 presence_count 전체 목록)
+# 클라이언트가 ?proto=count|delta 로 덮어쓸 수 있다 (rooms/presence.py 참고)
+ROOM_PRESENCE_PROTO = "delta"
+
+# 연결 리스 (하트비트가 끊긴 연결은 LEASE_SEC 뒤 스위퍼가 퇴장 처리)
+# 입퇴장 증분은 COALESCE_MS 창으로 모아 방송 (첫 이벤트 후 최대 COALESCE_MAX_MS 지연)
+ROOM_PRESENCE = {
+    "LEASE_SEC": 15,
+    "SWEEP_SEC": 5,
+    "COALESCE_MS": 25,
+    "COALESCE_MAX_MS": 100,
+}
+
+# 회원가입/로그인 비밀번호 해시 프로세스 풀 (rooms/hashing.py, 대기열이 넘치면 429)
+AUTH_HASHING = {
+    "WORKERS": 2,
+    "MAX_PENDING": 32,
+}
+
+# 방 목록/상세 응답 캐시 유지 시간 (초, 방이 바뀌면 즉시 무효화, rooms/cache.py 참고)
+ROOM_CACHE_TTL = 60
+
+# 방 서버 틱: 클라이언트 입력을 모아 틱마다 한 번 방송 (rooms/sim.py 참고)
+ROOM_SIM = {
+    "HZ": 20,
+    "MAX_INPUT_BYTES": 1024,
+}
+
 
 
 # Application definition
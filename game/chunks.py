@@ -0,0 +1,100 @@
+# game/chunks.py
+# 큰 프레임을 채널 레이어(Redis)로 보낼 때 고정 크기 조각으로 나누고, 받는 워커에서 다시 합친다.
+# 조각 사이사이에 다른 작은 메시지가 끼어들 수 있어 큰 프레임 하나가 그룹 큐를 막지 않는다.
+from django.conf import settings
+
+CHUNK_TYPE = "stream.chunk"
+PAYLOAD_FIELDS = ("data", "text")  # 나눌 대상 (바이너리 프레임 / JSON 프레임)
+
+# 조각 단위 통계 (GET /game/stats/ 의 "chunks")
+STATS = {
+    "frames_split": 0,
+    "chunks_sent": 0,
+    "chunks_received": 0,
+    "frames_reassembled": 0,
+    "incomplete_dropped": 0,
+}
+
+
+def chunk_bytes() -> int:
+    return getattr(settings, "STREAM_CHUNK_BYTES", 256 * 1024)
+
+
+def split_event(event, size=None):
+    """event 가 size 보다 크면 조각 메시지 리스트, 아니면 [event]."""
+    size = size or chunk_bytes()
+    field = next((f for f in PAYLOAD_FIELDS if f in event), None)
+    if field is None:
+        return [event]
+
+    body = event[field]
+    is_text = isinstance(body, str)
+    if is_text:
+        body = body.encode("utf-8")
+    if len(body) <= size:
+        return [event]
+
+    meta = {k: v for k, v in event.items() if k != field}
+    total = -(-len(body) // size)
+    messages = []
+    for seq in range(total):
+        msg = {
+            "type": CHUNK_TYPE,
+            "group": event.get("group"),
+            "origin": event.get("origin"),
+            "frame_id": event.get("key"),
+            "lane": event.get("rung"),  # rendition 은 원본과 따로 조립 (발행 태스크가 달라 조각이 섞일 수 있음)
+            "seq": seq,
+            "total": total,
+            "part": body[seq * size:(seq + 1) * size],
+        }
+        if seq == 0:
+            msg["field"] = field
+            msg["is_text"] = is_text
+            msg["meta"] = meta
+        messages.append(msg)
+
+    STATS["frames_split"] += 1
+    STATS["chunks_sent"] += total
+    return messages
+
+
+class Reassembler:
+    """(발행 워커, 그룹, lane) 마다 조립 중인 프레임 하나만 유지. 새 프레임이 시작되면 미완성 프레임은 버린다."""
+
+    def __init__(self):
+        self.partial = {}
+
+    def feed(self, msg):
+        """조각 하나 반영. 프레임이 완성되면 원래 event, 아니면 None."""
+        STATS["chunks_received"] += 1
+        slot = (msg.get("origin"), msg.get("group"), msg.get("lane"))
+        cur = self.partial.get(slot)
+
+        if cur is None or cur["frame_id"] != msg["frame_id"]:
+            if cur is not None:
+                STATS["incomplete_dropped"] += 1
+            if msg["seq"] != 0:
+                # 첫 조각(메타 포함)을 놓친 프레임은 조립할 수 없음
+                self.partial.pop(slot, None)
+                return None
+            cur = self.partial[slot] = {
+                "frame_id": msg["frame_id"],
+                "parts": [None] * msg["total"],
+                "missing": msg["total"],
+            }
+
+        if msg["seq"] == 0:
+            cur.update(field=msg["field"], is_text=msg["is_text"], meta=msg["meta"])
+        if cur["parts"][msg["seq"]] is None:
+            cur["parts"][msg["seq"]] = msg["part"]
+            cur["missing"] -= 1
+        if cur["missing"]:
+            return None
+
+        del self.partial[slot]
+        body = b"".join(cur["parts"])
+        event = dict(cur["meta"])
+        event[cur["field"]] = body.decode("utf-8") if cur["is_text"] else body
+        STATS["frames_reassembled"] += 1
+        return event
@@ -1,36 +1,505 @@
 # myapp/consumers.py
+import asyncio
+import hashlib
 import json
+import time
+from collections import deque
+from urllib.parse import parse_qs
+from django.conf import settings
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from rooms.redis_pool import CLAIM_LEASE, RELEASE_LEASE, get_redis
+
+from . import frames, telemetry
+from .delta import DeltaEncoder, delta_available, delta_settings
+from .hub import get_hub
+from .ladder import RungSelector, build_renditions, ladder_available, ladder_settings
+from .recorder import SegmentReader, StreamRecorder, recording_settings
+from .ringbuffer import event_size, ring_for
+
+LEGACY_GROUP = "stream_group"  # ws/stream/ (방 없이 접속한 구버전 클라이언트)
+
+def stream_group(room_id):   return f"stream_{room_id}" if room_id else LEGACY_GROUP
+def k_publisher(room_id):    return f"stream:{room_id}:publisher"
+
+
+def is_frame(event) -> bool:
+    """대기 슬롯에 실제 프레임이 있는지 (unchanged 하트비트 제외)."""
+    return event is not None and event["type"] != "send_unchanged"
+
+
+@database_sync_to_async
+def room_exists(room_id):
+    from rooms.models import Room
+    return Room.objects.filter(id=room_id).exists()
+
+
 class StreamConsumer(AsyncWebsocketConsumer):
+    # latest: 아직 못 보낸 프레임은 최신 것 하나만 유지 / all: 받은 순서대로 전부 전송
+    DELIVERY_MODES = ("latest", "all")
+    PUBLISHER_TTL = 10  # 퍼블리셔 슬롯 유지 시간(초), 프레임을 보내는 동안 TTL/2 마다 연장
+    ACK_TIMEOUT = 3.0   # ack 뷰어가 이 시간 동안 ack 을 안 보내면 보낸 프레임을 잃은 것으로 보고 창을 비움
+
     async def connect(self):
+        # ws/stream/<room_id>/ 이면 방 단위 그룹, ws/stream/ 이면 기존 전역 그룹
+        self.room_id = self.scope["url_route"]["kwargs"].get("room_id")
+        self.group = stream_group(self.room_id)
+        self.joined = False
+        self._sender = None
+        self.is_publisher = False
+        self._claim_checked = 0.0
+        self.redis = None
+        self.delta = None
+        self._last_digest = None  # 직전 프레임 내용 해시 (중복 프레임 억제)
+        self._rendering = set()   # 진행 중인 rendition 인코딩 태스크
+        self._backlog = None      # 접속 직후 따라잡기 중에 들어온 라이브 프레임
+
+        # ?mode=binary 이면 바이너리 프레임 수신 (없으면 기존 JSON/base64)
+        query = parse_qs((self.scope.get("query_string") or b"").decode())
+        self.binary = (query.get("mode") or ["json"])[0] == "binary"
+        self.published = 0  # 이 연결이 발행한 프레임 수 (변환 캐시 키용)
+        # ?record=1 퍼블리셔는 STREAM_RECORDING 이 켜져 있으면 디스크에 녹화
+        self.record = (query.get("record") or ["0"])[0] == "1"
+        self.recorder = None
+
+        # ?ack=1 뷰어는 그린 프레임마다 {"ack": frame_no} 를 보낸다.
+        # send() 는 소켓 버퍼에 넘기고 바로 돌아오므로 느린 링크는 ack 으로만 알 수 있다:
+        # ack 안 된 프레임이 STREAM_MAX_INFLIGHT 개면 더 보내지 않고 슬롯에서 최신 것으로 교체한다
+        self.ack = (query.get("ack") or ["0"])[0] == "1"
+        self.max_inflight = max(1, getattr(settings, "STREAM_MAX_INFLIGHT", 2))
+        self._inflight = deque(maxlen=64)  # (frame_no, 보낸 시각) ack 대기 중
+        self._acked = asyncio.Event()
+
+        default_delivery = getattr(settings, "STREAM_DELIVERY", "latest")
+        self.delivery = (query.get("delivery") or [default_delivery])[0]
+        if self.delivery not in self.DELIVERY_MODES:
+            self.delivery = default_delivery
+
+        if self.room_id:
+            if not await room_exists(self.room_id):
+                await self.close(code=4404); return
+
+            self.redis = get_redis()
+
+        # 뷰어별 전송 상태
+        self.stats = telemetry.viewer_connected(self.channel_name, self.group)
+        self._pending_key = None  # 델타가 기대는 키프레임은 최신 델타와 별도로 보존
+        self._pending = None      # 아직 못 보낸 최신 프레임/하트비트
+        self._wake = asyncio.Event()
+        # 화질 단계: 전송 → ack 왕복 시간을 보고 full → half → low 로 자동 전환 (ack 뷰어만)
+        self.rungs = RungSelector() if self.ack and self._ladder_enabled() else None
+        self._need_key = False
+        self._ladder_key = None  # 마지막 rendition 대상 키프레임 (늦게 온 이전 rendition 은 버림)
+        if self.delivery == "latest":
+            self._sender = asyncio.create_task(self._send_latest())
+
         await self.accept()
-        print("✅ 클라이언트 연결됨")
-        await self.channel_layer.group_add("stream_group", self.channel_name)  # 그룹 등록
-        await self.send(text_data=json.dumps({"message": "스트림 연결 OK"}))
+        print("✅ 클라이언트 연결됨", self.group)
+        await self.send(text_data=json.dumps({"message": "스트림 연결 OK", "roomId": self.room_id}))
+
+        # 늦게 들어온 뷰어: 마지막 키프레임 + 이후 델타를 바로 보내 첫 화면을 그린다.
+        # 스냅샷과 구독 사이에 await 가 없어야 그 사이 발행된 프레임을 놓치지 않는다.
+        # 스냅샷을 보내는 동안 온 라이브 프레임은 _backlog 에 모았다가 순서대로 이어서 보낸다.
+        catch_up = ring_for(self.group).snapshot()
+        self._backlog = []
+        # 채널 레이어 그룹 대신 프로세스 허브에 등록 (그룹에는 워커 채널 하나만 들어감)
+        self.joined = True
+        await get_hub().subscribe(self.group, self)
+
+        sent = set()
+        for event in catch_up:
+            sent.add(event.get("key"))
+            await self._deliver(event)
+        while self._backlog:
+            event = self._backlog.pop(0)
+            if event.get("key") is None or event["key"] not in sent:
+                await self._deliver(event)
+        self._backlog = None
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard("stream_group", self.channel_name)
-        print("❌ 연결 끊김")
+        if not self.joined:
+            return
+        await get_hub().unsubscribe(self.group, self)
+
+        if self.is_publisher:
+            try:
+                await RELEASE_LEASE(self.redis, [k_publisher(self.room_id)], [self.channel_name])
+            except Exception:
+                pass
+
+        if self.recorder:
+            await asyncio.to_thread(self.recorder.stop)
+            print(f"💾 녹화 종료 {self.recorder.id} (frames={self.recorder.written}, dropped={self.recorder.dropped})")
+
+        for task in self._rendering:
+            task.cancel()
+
+        if self._sender:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+        telemetry.viewer_disconnected(self.channel_name)
+        print(f"❌ 연결 끊김 (delivered={self.stats.frames_delivered}, dropped={self.stats.dropped})")
+
+    async def _claim_publisher(self) -> bool:
+        """방 퍼블리셔 슬롯 확인. 방당 한 명만 프레임을 발행할 수 있다."""
+        if not self.room_id:
+            return True
+
+        now = time.monotonic()
+        if now - self._claim_checked < self.PUBLISHER_TTL / 2:
+            return self.is_publisher
+        self._claim_checked = now
+
+        was_publisher = self.is_publisher
+        ok = await CLAIM_LEASE(self.redis, [k_publisher(self.room_id)], [self.channel_name, self.PUBLISHER_TTL * 1000])
+        self.is_publisher = bool(ok)
+        if not self.is_publisher and (was_publisher or self.published == 0):
+            await self.send(text_data=json.dumps({"error": "publisher slot taken", "roomId": self.room_id}))
+        return self.is_publisher
 
-    async def receive(self, text_data):
-        data = json.loads(text_data)   # dict 형태
+    async def receive(self, text_data=None, bytes_data=None):
+        self._ingest_ts = time.time()  # 수신 시각 스탬프 → 전송까지 지연 측정 기준
+        if bytes_data is not None:
+            await self._receive_binary(bytes_data)
+            return
+
+        try:
+            data = json.loads(text_data)   # dict 형태
+        except ValueError:
+            return
+        if not isinstance(data, dict):
+            return
+        if "ack" in data:
+            await self._on_ack(data["ack"])
+            return
         payload = data.get("payload")  # base64 이미지
         frame_no = data.get("frame_no")
+        # 형식이 맞지 않는 프레임은 버린다 (변환/중복 억제/녹화가 int frame_no, str payload 를 전제)
+        if not isinstance(payload, str) or not isinstance(frame_no, int) or isinstance(frame_no, bool):
+            return
+
+        if payload and await self._claim_publisher():
+            if await self._suppress_duplicate(payload.encode(), frame_no):
+                return
+            if self._recorder():
+                self.recorder.append_json(frame_no, payload, self._ingest_ts * 1000.0)
+            # 발행 시점에 한 번만 직렬화 → 뷰어들은 같은 text를 그대로 전송
+            await self._publish({
+                "type": "send_frame",
+                "text": frames.encode_json_frame(frame_no, payload),
+                "frame_no": frame_no,
+                "key": self._next_key(),
+            })
+
+    async def _receive_binary(self, data: bytes):
+        # 헤더만 확인하고 바디는 건드리지 않고 그대로 중계
+        try:
+            frame_no, _ts, codec = frames.unpack_header(data)
+        except ValueError:
+            return
+        if not await self._claim_publisher():
+            return
+        if await self._suppress_duplicate(frames.frame_body(data), frame_no):
+            return
+        if self._recorder():
+            self.recorder.append(data)  # 델타 이전 원본 프레임을 녹화
+
+        keyframe = True
+        if codec in frames.CODEC_MIME and self._delta_enabled():
+            if self.delta is None:
+                self.delta = DeltaEncoder()
+            # 디코딩/비교/타일 인코딩은 CPU 작업이라 이벤트 루프 밖에서
+            data, keyframe = await asyncio.to_thread(self.delta.encode, data)
+            if not keyframe:
+                codec = frames.CODEC_DELTA
+
+        event = {
+            "type": "send_frame_bytes",
+            "data": data,
+            "frame_no": frame_no,
+            "codec": codec,
+            "keyframe": keyframe,
+            "key": self._next_key(),
+        }
+        # 낮은 단계 뷰어는 이 키프레임 대신 뒤따르는 send_rendition 을 받는다
+        laddered = keyframe and codec in frames.CODEC_MIME and self._ladder_enabled()
+        if laddered:
+            event["laddered"] = True
+
+        frames.STATS.frame()  # 바이너리는 재직렬화 없음
+        await self._publish(event)
+        if laddered:
+            self._start_renditions(event)
+
+    def _start_renditions(self, event):
+        # 원본은 이미 발행했으니 재인코딩은 백그라운드에서 (WORKERS 개까지 동시에, 밀리면 이 키프레임은 건너뜀)
+        self._rendering = {t for t in self._rendering if not t.done()}
+        if len(self._rendering) >= ladder_settings()["WORKERS"]:
+            return
+        self._rendering.add(asyncio.create_task(self._publish_renditions(event)))
+
+    async def _publish_renditions(self, event):
+        """rendition 마다 한 번씩만 재인코딩 (워커 프로세스), 뷰어 수와 무관. rung 별로 따로 발행한다."""
+        try:
+            renditions = await build_renditions(event["data"])
+            if not renditions:
+                renditions = {None: event["data"]}  # 인코딩 실패: 낮은 단계 뷰어도 원본을 받는다
+            for rung, data in renditions.items():
+                await get_hub().publish(self.group, {
+                    "type": "send_rendition",
+                    "rung": rung,
+                    "data": data,
+                    "frame_no": event["frame_no"],
+                    "codec": frames.CODEC_JPEG,
+                    "key": event["key"],
+                    "ingest_ts": event["ingest_ts"],
+                })
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ rendition 발행 실패 (frame={event['frame_no']}): {e!r}")
+
+    def _recorder(self):
+        if self.recorder is None and self.record and recording_settings()["ENABLED"]:
+            self.recorder = StreamRecorder(self.room_id or "global")
+            print(f"💾 녹화 시작 {self.recorder.dir}")
+        return self.recorder
+
+    async def _suppress_duplicate(self, body: bytes, frame_no) -> bool:
+        """직전 프레임과 내용이 같으면 프레임 대신 작은 unchanged 하트비트만 보낸다."""
+        digest = hashlib.blake2b(body, digest_size=8).digest()
+        if digest != self._last_digest:
+            self._last_digest = digest
+            return False
+
+        await self._publish({
+            "type": "send_unchanged",
+            "frame_no": frame_no,
+            "text": json.dumps({"frame_no": frame_no, "unchanged": True}),
+            "data": frames.pack_frame(frame_no, b"", codec=frames.CODEC_UNCHANGED, ts=self._ingest_ts * 1000.0),
+        })
+        return True
+
+    async def _publish(self, event):
+        event["ingest_ts"] = self._ingest_ts
+        telemetry.record_ingest(self.group, event_size(event))
+        await get_hub().publish(self.group, event)
+
+    @staticmethod
+    def _delta_enabled():
+        return delta_settings()["ENABLED"] and delta_available()
+
+    @staticmethod
+    def _ladder_enabled():
+        return ladder_settings()["ENABLED"] and ladder_available()
+
+    def _next_key(self):
+        self.published += 1
+        return f"{self.channel_name}:{self.published}"
+
+    # ---------- 뷰어 전송 ----------
+    async def deliver_frame(self, event):
+        # game/hub.py 가 같은 프로세스의 뷰어들에게 같은 event 객체를 넘긴다 (수정 금지)
+        if self._backlog is not None:
+            self._backlog.append(event)  # 아직 따라잡기 중
+            return
+        await self._deliver(event)
+
+    async def _deliver(self, event):
+        if event["type"] == "send_unchanged":
+            await self._deliver_unchanged(event)
+            return
+
+        low = bool(self.rungs and self.rungs.index)
+        if event["type"] == "send_rendition":
+            if not low or event["rung"] not in (None, self.rungs.name) or event["key"] != self._ladder_key:
+                return  # 원본 단계 뷰어 / 다른 단계용 / 더 새 키프레임이 나온 뒤 늦게 끝난 인코딩
+        elif event.get("laddered"):
+            self._ladder_key = event["key"]
+            if low:
+                return  # 이 단계용 rendition 이 뒤따라온다
+
+        keyframe = event.get("keyframe", True)
+        if not keyframe:
+            # 델타는 원본 화질 키프레임 위에만 그릴 수 있다:
+            # 구버전(JSON) 뷰어, 낮은 단계 뷰어, 단계를 막 올려 키프레임을 기다리는 뷰어는 건너뜀
+            if not self.binary or low or self._need_key:
+                telemetry.record_drop(self.stats)
+                return
+        elif self._need_key and not low:
+            self._need_key = False
+
+        if self.delivery == "all":
+            await self._send_safely(event)
+            return
+
+        # latest: 채널 큐는 바로 비우고, 아직 안 나간 프레임은 최신 것으로 교체
+        if keyframe:
+            # 새 키프레임이면 대기 중인 키프레임/델타 모두 필요 없음
+            replaced = is_frame(self._pending_key) + is_frame(self._pending)
+            if replaced:
+                telemetry.record_drop(self.stats, replaced)
+            self._pending_key, self._pending = event, None
+        else:
+            if is_frame(self._pending):
+                telemetry.record_drop(self.stats)
+            self._pending = event
+        self._wake.set()
+
+    async def _deliver_unchanged(self, event):
+        if self.delivery == "all":
+            await self._send_safely(event)
+            return
+        # 대기 중인 프레임이 있으면 그게 더 최신 화면이니 하트비트는 버린다
+        if self._pending_key is None and self._pending is None:
+            self._pending = event
+            self._wake.set()
+
+    async def _send_latest(self):
+        while True:
+            await self._wake.wait()
+            # ack 창이 찰 때까지 기다리는 동안 들어온 프레임은 슬롯에서 최신 것으로 교체된다
+            await self._wait_window()
+            slot = "_pending_key" if self._pending_key is not None else "_pending"
+            event = getattr(self, slot)
+            setattr(self, slot, None)
+            if self._pending_key is None and self._pending is None:
+                self._wake.clear()
+            if event is not None:
+                await self._send_safely(event)
+
+    async def _wait_window(self):
+        if not self.ack:
+            return
+        while len(self._inflight) >= self.max_inflight:
+            self._acked.clear()
+            try:
+                await asyncio.wait_for(self._acked.wait(), self.ACK_TIMEOUT)
+            except asyncio.TimeoutError:
+                # ack 이 끊긴 뷰어 (탭 백그라운드 등): 아주 느린 링크로 보고 창을 비운다
+                self._inflight.clear()
+                await self._observe_rtt(self.ACK_TIMEOUT)
+
+    async def _on_ack(self, frame_no):
+        """ack 된 프레임까지 창에서 뺀다 (그 앞에서 ack 이 빠진 프레임도 함께)."""
+        if not self.ack:
+            return
+        now = time.monotonic()
+        while self._inflight:
+            no, sent = self._inflight.popleft()
+            if no == frame_no:
+                await self._observe_rtt(now - sent)
+                break
+        self._acked.set()
+
+    async def _observe_rtt(self, seconds):
+        """화질 단계는 전송 → ack 왕복 시간으로 고른다 (send() 는 링크 속도와 무관하게 바로 돌아온다)."""
+        if not self.rungs:
+            return
+        now = time.monotonic()
+        if self.rungs.observe(seconds * 1000.0, now):
+            if self.rungs.index == 0:
+                self._need_key = True  # 원본으로 올라가면 다음 키프레임부터 델타 재개
+            self.stats.rung = self.rungs.name
+            await self.send(text_data=json.dumps({"rung": self.rungs.name}))
+
+    async def _send_safely(self, event):
+        # 프레임 하나가 실패해도 (구버전 형식 변환 오류 등) 이 뷰어의 전송은 계속된다
+        try:
+            await self._send_timed(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            telemetry.record_drop(self.stats)
+            print(f"❌ 프레임 전송 실패 ({self.channel_name}, frame={event.get('frame_no')}): {e!r}")
+
+    async def _send_timed(self, event):
+        nbytes = await self._send_event(event)
+        if self.ack:
+            self._inflight.append((event.get("frame_no"), time.monotonic()))
+        telemetry.record_delivery(self.stats, nbytes, event.get("ingest_ts"))
+
+    async def _send_event(self, event) -> int:
+        """프레임 하나를 이 뷰어 형식으로 전송하고 보낸 바이트 수를 돌려준다."""
+        if event["type"] == "send_unchanged":
+            if self.binary:
+                await self.send(bytes_data=event["data"])
+                return len(event["data"])
+            await self.send(text_data=event["text"])
+            return len(event["text"])
+
+        if event["type"] == "send_frame":
+            if self.binary:
+                data = frames.json_to_binary(event["text"], event)
+                await self.send(bytes_data=data)
+                return len(data)
+            await self.send(text_data=event["text"])
+            return len(event["text"])
+
+        data = event["data"]
+        if self.binary:
+            await self.send(bytes_data=data)
+            return len(data)
+        # 구버전 뷰어: base64 JSON으로 변환 (프로세스당 프레임 1번)
+        text = frames.binary_to_json_text(data, event)
+        await self.send(text_data=text)
+        return len(text)
+
+
+class ReplayConsumer(AsyncWebsocketConsumer):
+    """
+    ws/replay/<room_id>/<rec_id>/?mode=binary&speed=1
+    녹화된 프레임을 원래 간격(speed 배속)으로 다시 보낸다. 세그먼트는 mmap 으로 읽음.
+    """
+
+    async def connect(self):
+        kwargs = self.scope["url_route"]["kwargs"]
+        query = parse_qs((self.scope.get("query_string") or b"").decode())
+        self.binary = (query.get("mode") or ["json"])[0] == "binary"
+        try:
+            self.speed = max(0.1, float((query.get("speed") or ["1"])[0]))
+        except ValueError:
+            self.speed = 1.0
+        self.player = None
+
+        try:
+            self.reader = SegmentReader(kwargs["room_id"], kwargs["rec_id"])
+        except FileNotFoundError:
+            await self.close(code=4404); return
+
+        await self.accept()
+        self.player = asyncio.create_task(self._play())
+
+    async def disconnect(self, close_code):
+        if self.player:
+            self.player.cancel()
+            try:
+                await self.player
+            except asyncio.CancelledError:
+                pass
+
+    async def _play(self):
+        it = self.reader.frames()
+        first_ts = started = None
+        while True:
+            # mmap 읽기(페이지 폴트)는 이벤트 루프 밖에서
+            item = await asyncio.to_thread(next, it, None)
+            if item is None:
+                break
+            frame_no, ts, data = item
+            if first_ts is None:
+                first_ts, started = ts, time.monotonic()
+            delay = (ts - first_ts) / 1000.0 / self.speed - (time.monotonic() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
 
-        if payload:
-            # group_send로 payload와 frame_no 전달
-            await self.channel_layer.group_send(
-                "stream_group",
-                {
-                    "type": "send_frame",
-                    "payload": payload,
-                    "frame_no": frame_no,
-                }
-            )
-
-    async def send_frame(self, event):
-        await self.send(text_data=json.dumps({
-            "frame_no": event["frame_no"],
-            "payload": event["payload"]
-        }))
+            if self.binary:
+                await self.send(bytes_data=data)
+            else:
+                await self.send(text_data=frames.binary_to_json_text(data))
+        await self.send(text_data=json.dumps({"message": "replay end"}))
+        await self.close()
@@ -0,0 +1,99 @@
+# game/delta.py
+# 타일 단위 델타 인코딩: 마지막 키프레임과 비교해 바뀐 타일만 JPEG으로 다시 보낸다.
+import io
+import struct
+
+from django.conf import settings
+
+from . import frames
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # numpy/Pillow 없으면 델타 단계는 꺼진다
+    np = None
+    Image = None
+
+# 델타 바디: width, height, tile, n_tiles (uint16 x4) + 타일마다 (tx, ty uint16, len uint32, jpeg)
+DELTA_HEADER = struct.Struct("!HHHH")
+TILE_HEADER = struct.Struct("!HHI")
+
+DEFAULTS = {
+    "ENABLED": False,
+    "TILE": 32,                 # 타일 한 변(px)
+    "KEYFRAME_INTERVAL": 30,    # 이 프레임 수마다 키프레임 강제
+    "THRESHOLD": 12,            # 픽셀 채널 차이가 이 값을 넘으면 바뀐 타일 (JPEG 노이즈 무시)
+    "MAX_CHANGED_RATIO": 0.5,   # 바뀐 타일 비율이 이보다 크면 그냥 키프레임
+    "QUALITY": 80,              # 타일 JPEG 품질
+}
+
+
+def delta_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "STREAM_DELTA", {})}
+
+
+def delta_available() -> bool:
+    return np is not None and Image is not None
+
+
+def decode_image(body: bytes):
+    return np.asarray(Image.open(io.BytesIO(body)).convert("RGB"))
+
+
+def changed_tiles(key, cur, tile: int, threshold: int):
+    """(rows, cols) bool 배열. 두 이미지를 타일로 나눠 최대 채널 차이를 한 번에 비교."""
+    h, w = cur.shape[:2]
+    rows, cols = -(-h // tile), -(-w // tile)
+    diff = np.abs(cur.astype(np.int16) - key.astype(np.int16)).max(axis=2)
+    # 가장자리 타일도 같은 모양이 되도록 0으로 패딩
+    padded = np.zeros((rows * tile, cols * tile), dtype=diff.dtype)
+    padded[:h, :w] = diff
+    return padded.reshape(rows, tile, cols, tile).max(axis=(1, 3)) > threshold
+
+
+class DeltaEncoder:
+    """퍼블리셔 한 명(스트림 하나)의 키프레임 상태. 이벤트 루프 밖(스레드)에서 호출한다."""
+
+    def __init__(self, conf=None):
+        conf = conf or delta_settings()
+        self.tile = conf["TILE"]
+        self.interval = conf["KEYFRAME_INTERVAL"]
+        self.threshold = conf["THRESHOLD"]
+        self.max_ratio = conf["MAX_CHANGED_RATIO"]
+        self.quality = conf["QUALITY"]
+        self.key = None
+        self.since_key = 0
+
+    def encode(self, data: bytes):
+        """바이너리 프레임 → (보낼 바이트, 키프레임 여부)."""
+        frame_no, ts, codec = frames.unpack_header(data)
+        try:
+            cur = decode_image(frames.frame_body(data))
+        except Exception:
+            return data, True  # 디코딩 못 하면 원본 그대로
+
+        if self.key is None or self.key.shape != cur.shape or self.since_key >= self.interval:
+            return self._keyframe(data, cur)
+
+        mask = changed_tiles(self.key, cur, self.tile, self.threshold)
+        if mask.mean() > self.max_ratio:
+            return self._keyframe(data, cur)
+
+        self.since_key += 1
+        h, w = cur.shape[:2]
+        parts = []
+        for ty, tx in np.argwhere(mask):
+            y, x = ty * self.tile, tx * self.tile
+            buf = io.BytesIO()
+            Image.fromarray(cur[y:y + self.tile, x:x + self.tile]).save(buf, "JPEG", quality=self.quality)
+            jpeg = buf.getvalue()
+            parts.append(TILE_HEADER.pack(int(tx), int(ty), len(jpeg)))
+            parts.append(jpeg)
+
+        body = DELTA_HEADER.pack(w, h, self.tile, int(mask.sum())) + b"".join(parts)
+        return frames.pack_frame(frame_no, body, codec=frames.CODEC_DELTA, ts=ts), False
+
+    def _keyframe(self, data, cur):
+        self.key = cur
+        self.since_key = 0
+        return data, True
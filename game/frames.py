@@ -0,0 +1,113 @@
+# game/frames.py
+import base64
+import json
+import struct
+import time
+
+# 바이너리 프레임 헤더: frame_no(uint32) + timestamp(float64, ms) + codec(uint8) = 13 bytes
+# 헤더 뒤에는 인코딩된 이미지 바이트가 그대로 붙는다.
+HEADER = struct.Struct("!IdB")
+
+CODEC_JPEG = 0
+CODEC_PNG = 1
+CODEC_WEBP = 2
+CODEC_DELTA = 16  # 서버 델타 단계가 만든 타일 프레임 (game/delta.py)
+CODEC_UNCHANGED = 17  # 바디 없음: 직전 프레임과 같음 (frame_no만 전달)
+
+CODEC_MIME = {
+    CODEC_JPEG: "image/jpeg",
+    CODEC_PNG: "image/png",
+    CODEC_WEBP: "image/webp",
+}
+
+
+def now_ms() -> float:
+    return time.time() * 1000.0
+
+
+def pack_frame(frame_no, payload: bytes, codec=CODEC_JPEG, ts=None) -> bytes:
+    ts = now_ms() if ts is None else ts
+    return HEADER.pack((frame_no or 0) & 0xFFFFFFFF, ts, codec) + payload
+
+
+def unpack_header(data: bytes):
+    """(frame_no, timestamp, codec) 반환. 헤더가 모자라면 ValueError."""
+    if len(data) < HEADER.size:
+        raise ValueError("frame shorter than header")
+    return HEADER.unpack_from(data)
+
+
+def frame_body(data: bytes) -> bytes:
+    return data[HEADER.size:]
+
+
+class SerializeStats:
+    """프로세스 단위 직렬화 카운터. 뷰어 수가 늘어도 frame 당 바이트가 늘지 않는지 확인용."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.conversions = 0
+
+    def frame(self, nbytes=0):
+        self.frames += 1
+        self.bytes += nbytes
+
+    def convert(self, nbytes):
+        self.conversions += 1
+        self.bytes += nbytes
+
+    def snapshot(self) -> dict:
+        return {
+            "frames": self.frames,
+            "bytes_serialized": self.bytes,
+            "conversions": self.conversions,
+            "bytes_per_frame": round(self.bytes / self.frames, 1) if self.frames else 0,
+        }
+
+
+STATS = SerializeStats()
+
+
+def encode_json_frame(frame_no, payload: str) -> str:
+    """발행 시점에 한 번만 직렬화해서 모든 뷰어에게 같은 문자열을 보낸다."""
+    text = json.dumps({"frame_no": frame_no, "payload": payload})
+    STATS.frame(len(text))
+    return text
+
+
+# ---------- 구버전(JSON/base64) 클라이언트 호환 ----------
+# 변환 결과는 이벤트 dict 에 붙여 둔다. 한 프로세스의 뷰어들과 링 버퍼는 허브가 넘긴 같은 dict 를 공유하므로
+# 활성 스트림 수와 상관없이 프레임당 한 번만 변환되고, 이벤트가 버려질 때 같이 사라진다.
+CONVERTED = "_converted"
+
+
+def _memo(event, kind, build):
+    if event is None:
+        return build()
+    memo = event.setdefault(CONVERTED, {})
+    value = memo.get(kind)
+    if value is None:
+        value = memo[kind] = build()
+    return value
+
+
+def binary_to_json_text(data: bytes, event=None) -> str:
+    def build():
+        frame_no, _ts, _codec = unpack_header(data)
+        text = json.dumps({
+            "frame_no": frame_no,
+            "payload": base64.b64encode(frame_body(data)).decode("ascii"),
+        })
+        STATS.convert(len(text))
+        return text
+    return _memo(event, "json", build)
+
+
+def json_to_binary(text: str, event=None) -> bytes:
+    def build():
+        msg = json.loads(text)
+        data = pack_frame(msg.get("frame_no"), base64.b64decode(msg["payload"]))
+        STATS.convert(len(data))
+        return data
+    return _memo(event, "bin", build)
@@ -0,0 +1,97 @@
+# game/hub.py
+# 프로세스 안 스트림 팬아웃 허브.
+# 같은 프로세스의 뷰어에게는 메모리에서 바로 넘기고, 채널 레이어(Redis)에는 프레임당 한 번만 보낸다.
+# 그룹에는 뷰어 채널이 아니라 워커(허브) 채널만 들어가므로 Redis 트래픽은 O(워커 수).
+import asyncio
+import uuid
+
+from channels.layers import get_channel_layer
+
+from .chunks import CHUNK_TYPE, Reassembler, split_event
+from .ringbuffer import ring_for
+
+
+class StreamHub:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.layer = get_channel_layer()
+        self.subscribers = {}   # group -> set(StreamConsumer)
+        self.channel = None
+        self._reader = None
+        self._reassembler = Reassembler()
+
+    async def subscribe(self, group, consumer):
+        # 로컬 등록은 첫 await 전에 끝난다 (StreamConsumer 가 링 스냅샷 직후 호출해 프레임을 놓치지 않음)
+        subs = self.subscribers.get(group)
+        if subs is not None:
+            subs.add(consumer)
+            return
+        self.subscribers[group] = {consumer}
+        await self._ensure_channel()
+        await self.layer.group_add(group, self.channel)
+
+    async def unsubscribe(self, group, consumer):
+        subs = self.subscribers.get(group)
+        if not subs:
+            return
+        subs.discard(consumer)
+        if not subs:
+            del self.subscribers[group]
+            await self.layer.group_discard(group, self.channel)
+
+    async def publish(self, group, event):
+        event["origin"] = self.id
+        event["group"] = group
+        # 로컬 뷰어가 이벤트에 붙이는 변환 결과(frames.CONVERTED)가 Redis 로 나가지 않도록 전송용 사본을 먼저 만든다
+        wire = dict(event)
+        await self._dispatch(group, event)
+        # 큰 프레임은 조각내서 보낸다 (Redis 메시지 크기 제한 / 그룹 큐 막힘 방지)
+        for message in split_event(wire):
+            await self.layer.group_send(group, message)
+
+    async def _dispatch(self, group, event):
+        ring_for(group).push(event)
+        subs = self.subscribers.get(group)
+        if subs:
+            await asyncio.gather(*(c.deliver_frame(event) for c in list(subs)))
+
+    async def _ensure_channel(self):
+        if self.channel is None:
+            self.channel = await self.layer.new_channel(prefix="stream-hub")
+            self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        # 다른 워커가 발행한 프레임만 받는다 (내가 보낸 건 이미 로컬로 전달함)
+        while True:
+            try:
+                message = await self.layer.receive(self.channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("[hub] receive error:", repr(e))
+                await asyncio.sleep(1)
+                continue
+
+            if message.get("origin") == self.id:
+                continue
+            if message.get("type") == CHUNK_TYPE:
+                message = self._reassembler.feed(message)
+                if message is None:
+                    continue
+            group = message.get("group")
+            if group:
+                await self._dispatch(group, message)
+
+
+_hubs = {}
+
+
+def get_hub() -> StreamHub:
+    """이벤트 루프마다 허브 하나."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        for old in [l for l in _hubs if l.is_closed()]:
+            del _hubs[old]
+        hub = _hubs[loop] = StreamHub()
+    return hub
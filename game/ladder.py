@@ -0,0 +1,105 @@
+# game/ladder.py
+# 키프레임을 몇 가지 화질(rendition)로 미리 인코딩해 두고, 뷰어마다 ack 왕복 시간에 맞춰 단계를 고른다.
+# 원본은 바로 발행하고 rendition 은 인코딩이 끝나는 대로 send_rendition 으로 뒤따라 보낸다.
+import io
+
+from django.conf import settings
+
+from rooms.procpool import SpawnPool
+
+from . import frames
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 없으면 ladder는 꺼진다
+    Image = None
+
+DEFAULTS = {
+    "ENABLED": False,
+    "WORKERS": 2,          # 재인코딩 프로세스 수
+    # 0번은 항상 퍼블리셔 원본. 아래로 갈수록 가볍다.
+    "RUNGS": [
+        {"name": "full"},
+        {"name": "half", "scale": 0.5, "quality": 70},
+        {"name": "low", "scale": 0.5, "quality": 35},
+    ],
+    "DOWN_MS": 250,        # 전송 → ack 왕복 시간(EWMA)이 이보다 크면 한 단계 내림
+    "UP_MS": 60,           # 이보다 작으면 한 단계 올림
+    "SWITCH_SEC": 2.0,     # 단계 변경 후 최소 유지 시간
+}
+
+
+def ladder_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "STREAM_LADDER", {})}
+
+
+def ladder_available() -> bool:
+    return Image is not None
+
+
+def render_renditions(body: bytes, rungs) -> dict:
+    """워커 프로세스에서 실행. 원본 이미지를 rung별 JPEG으로 다시 인코딩."""
+    img = Image.open(io.BytesIO(body)).convert("RGB")
+    out = {}
+    for rung in rungs:
+        scale = rung.get("scale", 1.0)
+        im = img
+        if scale < 1.0:
+            im = img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.BILINEAR)
+        buf = io.BytesIO()
+        im.save(buf, "JPEG", quality=rung.get("quality", 75))
+        out[rung["name"]] = buf.getvalue()
+    return out
+
+
+pool = SpawnPool(lambda: ladder_settings()["WORKERS"])
+
+
+async def build_renditions(data: bytes) -> dict:
+    """바이너리 키프레임 → {rung 이름: 헤더 포함 바이너리 프레임}. 원본(0번)은 포함하지 않는다."""
+    frame_no, ts, _codec = frames.unpack_header(data)
+    rungs = ladder_settings()["RUNGS"][1:]
+    if not rungs:
+        return {}
+    try:
+        bodies = await pool.run(render_renditions, frames.frame_body(data), rungs)
+    except Exception:
+        return {}
+    return {
+        name: frames.pack_frame(frame_no, body, codec=frames.CODEC_JPEG, ts=ts)
+        for name, body in bodies.items()
+    }
+
+
+class RungSelector:
+    """뷰어 한 명의 단계 선택. 프레임을 보낸 시점부터 뷰어의 ack 까지 걸린 시간을 본다."""
+
+    ALPHA = 0.2
+
+    def __init__(self, conf=None):
+        conf = conf or ladder_settings()
+        self.names = [r["name"] for r in conf["RUNGS"]]
+        self.down_ms = conf["DOWN_MS"]
+        self.up_ms = conf["UP_MS"]
+        self.switch_sec = conf["SWITCH_SEC"]
+        self.index = 0
+        self.latency_ms = 0.0
+        self.switched_at = 0.0
+
+    @property
+    def name(self):
+        return self.names[self.index]
+
+    def observe(self, latency_ms: float, now: float) -> bool:
+        """지연 하나 반영. 단계가 바뀌면 True."""
+        self.latency_ms += self.ALPHA * (latency_ms - self.latency_ms)
+        if now - self.switched_at < self.switch_sec:
+            return False
+        if self.latency_ms > self.down_ms and self.index < len(self.names) - 1:
+            self.index += 1
+        elif self.latency_ms < self.up_ms and self.index > 0:
+            self.index -= 1
+        else:
+            return False
+        self.switched_at = now
+        return True
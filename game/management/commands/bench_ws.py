@@ -0,0 +1,366 @@
+# game/management/commands/bench_ws.py
+"""
+WebSocket 부하 테스트 / 벤치마크.
+
+ASGI application 을 프로세스 안에서 띄우고 (네트워크 없이 channels.testing 커뮤니케이터 사용)
+N 명의 퍼블리셔 + 스트림마다 M 명의 뷰어를 StreamConsumer 에,
+R 개 방 × K 명을 RoomConsumer 에 붙여 돌린 뒤 결과를 JSON 으로 출력한다.
+
+    python manage.py bench_ws --publishers 2 --viewers 50 --rooms 10 --room-clients 20 --duration 10
+    python manage.py bench_ws --redis-url redis://127.0.0.1:6379/9 --channel-layer redis -o bench.json
+
+Redis: --redis-url 이 있으면 공용 풀(rooms/redis_pool.py), 없으면 fakeredis 를 쓴다. 채널 레이어는 기본 in-memory.
+      presence 는 Lua 스크립트를 쓰므로 fakeredis 에는 lupa 가 필요하다 (pip install "fakeredis[lua]", requirement.txt 에 있음).
+지연: 스트림은 퍼블리셔 타임스탬프 → 뷰어 수신, 방은 입력 전송 → 그 입력이 반영된 틱 수신 (--input-hz),
+      입장 → 다른 접속자의 member_joined 수신 (--churn-sec 마다 방마다 한 명씩 들어왔다 나감).
+DB: 테스트 DB를 만들어 방을 생성하고 끝나면 지운다 (운영 DB는 건드리지 않음).
+"""
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "StreamConsumer / RoomConsumer WebSocket 벤치마크 (결과 JSON)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--publishers", type=int, default=1, help="스트림(퍼블리셔) 수")
+        parser.add_argument("--viewers", type=int, default=20, help="스트림당 뷰어 수")
+        parser.add_argument("--fps", type=float, default=30.0, help="퍼블리셔 프레임 속도")
+        parser.add_argument("--frame-bytes", type=int, default=50_000, help="프레임 바디 크기")
+        parser.add_argument("--delivery", default="latest", choices=["latest", "all"])
+        parser.add_argument("--rooms", type=int, default=5, help="presence 벤치 방 수")
+        parser.add_argument("--room-clients", type=int, default=20, help="방당 접속 수")
+        parser.add_argument("--input-hz", type=float, default=5.0, help="방 접속자당 입력 전송 속도 (0이면 끔)")
+        parser.add_argument("--churn-sec", type=float, default=0.5, help="방마다 이 간격으로 입퇴장 한 번 (0이면 끔)")
+        parser.add_argument("--duration", type=float, default=10.0, help="측정 시간(초)")
+        parser.add_argument("--redis-url", default=None, help="없으면 fakeredis + lupa 사용")
+        parser.add_argument("--channel-layer", default="memory", choices=["memory", "redis"])
+        parser.add_argument("-o", "--output", default=None, help="결과 JSON 파일 (기본: stdout)")
+
+    def handle(self, *args, **opts):
+        if opts["channel_layer"] == "redis" and not opts["redis_url"]:
+            raise CommandError("--channel-layer redis 는 --redis-url 이 필요합니다")
+
+        self._configure_channel_layer(opts)
+        redis = self._redis_client(opts["redis_url"])
+
+        from django.db import connection
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            tracemalloc.start()
+            # 컨슈머 print 로그가 결과 JSON(stdout)에 섞이지 않도록
+            with contextlib.redirect_stdout(sys.stderr):
+                result = asyncio.run(self._run(opts, redis))
+            _cur, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        result["memory"] = {
+            "tracemalloc_peak_mb": round(peak / 2**20, 2),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        }
+        result["config"] = {k: opts[k] for k in (
+            "publishers", "viewers", "fps", "frame_bytes", "delivery",
+            "rooms", "room_clients", "input_hz", "churn_sec", "duration", "channel_layer",
+        )}
+        result["config"]["redis"] = "url" if opts["redis_url"] else "fakeredis"
+        result["env"] = {"python": platform.python_version(), "pid": os.getpid()}
+
+        out = json.dumps(result, indent=2, ensure_ascii=False)
+        if opts["output"]:
+            with open(opts["output"], "w") as f:
+                f.write(out + "\n")
+        else:
+            self.stdout.write(out)
+
+    # ---------- 환경 ----------
+    def _configure_channel_layer(self, opts):
+        from channels.layers import channel_layers
+        if opts["channel_layer"] == "memory":
+            settings.CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+        else:
+            settings.CHANNEL_LAYERS = {"default": {
+                "BACKEND": "channels_redis.core.RedisChannelLayer",
+                "CONFIG": {"hosts": [opts["redis_url"]], "capacity": 10000},
+            }}
+        channel_layers.backends.clear()
+
+    def _redis_client(self, url):
+        if url:
+            settings.REDIS_URL = url
+            return None, None  # 실제 공용 풀 (rooms/redis_pool.py) 사용 → 풀 지표도 함께 측정
+        try:
+            import fakeredis
+            import lupa  # noqa: F401  presence Lua 스크립트 실행용
+        except ImportError:
+            raise CommandError('--redis-url 을 주거나 fakeredis + lupa 를 설치하세요 (pip install "fakeredis[lua]")')
+        server = fakeredis.FakeServer()
+        # 동기 클라이언트(방 캐시 세대 번호 등)도 같은 가짜 서버로
+        return (
+            lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+            lambda: fakeredis.FakeRedis(server=server, decode_responses=True),
+        )
+
+    # ---------- 실행 ----------
+    async def _run(self, opts, redis):
+        from channels.db import database_sync_to_async
+        from config.asgi import application
+        from rooms import redis_pool
+
+        # 컨슈머가 쓰는 공용 클라이언트를 교체 (루프마다 redis() 로 생성)
+        redis_pool.use_factory(*redis)
+
+        @database_sync_to_async
+        def make_rooms(n):
+            from rooms.models import Room, User
+            host = User.objects.create_user("bench-host", "bench-pass")
+            return [Room.objects.create(host=host, name=f"bench-{i}").id for i in range(n)]
+
+        room_ids = await make_rooms(max(opts["publishers"], opts["rooms"]))
+        stream = StreamBench(application, room_ids[:opts["publishers"]], opts)
+        presence = PresenceBench(application, room_ids[:opts["rooms"]], opts)
+
+        await stream.connect()
+        await presence.connect()
+        started = time.monotonic()
+        await asyncio.gather(stream.run(opts["duration"]), presence.run(opts["duration"]))
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(0.5)  # 전송 중인 프레임 마무리
+        await stream.close()
+        await presence.close()
+
+        from game import telemetry
+        result = {
+            "elapsed_sec": round(elapsed, 3),
+            "stream": stream.report(elapsed),
+            "presence": presence.report(elapsed),
+            "server_telemetry": telemetry.snapshot()["streams"],
+            "redis_pool": redis_pool.metrics(),
+        }
+        await redis_pool.shutdown()
+        return result
+
+
+class Client:
+    """커뮤니케이터 하나 + 수신 카운터."""
+
+    def __init__(self, application, path):
+        from channels.testing import WebsocketCommunicator
+        self.comm = WebsocketCommunicator(application, path)
+        self.msgs = 0
+        self.bytes = 0
+        self.reader = None
+
+    async def connect(self, on_message=None):
+        ok, code = await self.comm.connect(timeout=10)
+        if not ok:
+            raise CommandError(f"connect failed: {code}")
+        self.reader = asyncio.create_task(self._read(on_message))
+
+    async def _read(self, on_message):
+        # receive_output(timeout) 은 타임아웃 시 앱을 취소하므로 큐에서 직접 꺼낸다
+        queue = self.comm.output_queue
+        while True:
+            msg = await queue.get()
+            if msg["type"] != "websocket.send":
+                return
+            body = msg.get("bytes") or msg.get("text") or ""
+            self.msgs += 1
+            self.bytes += len(body)
+            if on_message:
+                on_message(msg)
+
+    async def close(self):
+        if self.reader:
+            self.reader.cancel()
+        try:
+            await self.comm.disconnect(timeout=5)
+        except BaseException:
+            pass
+
+
+class StreamBench:
+    def __init__(self, application, room_ids, opts):
+        from game.telemetry import LatencyHistogram
+        self.application = application
+        self.room_ids = room_ids
+        self.opts = opts
+        self.latency = LatencyHistogram()
+        self.publishers = []
+        self.viewers = []
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.frames_received = 0  # 뷰어가 받은 바이너리 프레임 (인사말/unchanged/rung 메시지 제외)
+
+    async def connect(self):
+        from game import frames
+        delivery = self.opts["delivery"]
+        for room_id in self.room_ids:
+            pub = Client(self.application, f"/ws/stream/{room_id}/?mode=binary")
+            await pub.connect()
+            self.publishers.append(pub)
+            for _ in range(self.opts["viewers"]):
+                v = Client(self.application, f"/ws/stream/{room_id}/?mode=binary&delivery={delivery}")
+                await v.connect(self._on_frame)
+                self.viewers.append(v)
+        self._frames = frames
+
+    def _on_frame(self, msg):
+        data = msg.get("bytes")
+        if not data:
+            return
+        _no, ts, codec = self._frames.unpack_header(data)
+        if codec == self._frames.CODEC_UNCHANGED:
+            return
+        self.frames_received += 1
+        self.latency.record(max(0.0, time.time() - ts / 1000.0))
+
+    async def run(self, duration):
+        await asyncio.gather(*(self._publish(p, duration) for p in self.publishers))
+
+    async def _publish(self, pub, duration):
+        frames = self._frames
+        interval = 1.0 / self.opts["fps"]
+        filler = os.urandom(self.opts["frame_bytes"])
+        end = time.monotonic() + duration
+        frame_no = 0
+        next_at = time.monotonic()
+        while time.monotonic() < end:
+            # 매 프레임 내용이 달라야 중복 억제에 걸리지 않는다
+            body = frame_no.to_bytes(4, "big") + filler
+            data = frames.pack_frame(frame_no, body)
+            await pub.comm.send_to(bytes_data=data)
+            self.frames_sent += 1
+            self.bytes_sent += len(data)
+            frame_no += 1
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+
+    async def close(self):
+        for c in self.viewers + self.publishers:
+            await c.close()
+
+    def report(self, elapsed):
+        received = sum(v.msgs for v in self.viewers)
+        nbytes = sum(v.bytes for v in self.viewers)
+        expected = self.frames_sent * self.opts["viewers"]
+        return {
+            "frames_published": self.frames_sent,
+            "publish_bytes_per_sec": round(self.bytes_sent / elapsed),
+            "viewer_msgs": received,
+            "viewer_msgs_per_sec": round(received / elapsed, 1),
+            "viewer_bytes_per_sec": round(nbytes / elapsed),
+            "viewer_frames": self.frames_received,
+            "delivery_ratio": round(self.frames_received / expected, 4) if expected else None,
+            "latency_ms": self.latency.snapshot(),
+        }
+
+
+class PresenceBench:
+    def __init__(self, application, room_ids, opts):
+        from game.telemetry import LatencyHistogram
+        self.application = application
+        self.room_ids = room_ids
+        self.opts = opts
+        self.clients = []
+        self.connect_sec = 0.0
+        self.input_latency = LatencyHistogram()  # 입력 전송 → 반영된 틱 수신
+        self.join_latency = LatencyHistogram()   # 입장 → 다른 접속자의 member_joined 수신
+        self.inputs_sent = 0
+        self._pending = {}  # (room_id, name) -> [(seq, 보낸 시각), ...]
+        self._joins = {}    # (room_id, name) -> 입장 시작 시각
+
+    async def connect(self):
+        started = time.monotonic()
+        for room_id in self.room_ids:
+            for i in range(self.opts["room_clients"]):
+                await self._join(room_id, f"bench-{i}")
+        self.connect_sec = time.monotonic() - started
+
+    async def _join(self, room_id, name):
+        c = Client(self.application, f"/ws/rooms/{room_id}/?name={name}")
+        await c.connect(lambda msg: self._on_message(room_id, name, msg))
+        c.room_id, c.name = room_id, name
+        self.clients.append(c)
+        return c
+
+    def _on_message(self, room_id, name, msg):
+        text = msg.get("text")
+        if not text:
+            return
+        now = time.time()
+        data = json.loads(text)
+        kind = data.get("type")
+        if kind == "tick":
+            ack = data["acks"].get(name)
+            pending = self._pending.get((room_id, name))
+            while ack is not None and pending and pending[0][0] <= ack:
+                self.input_latency.record(now - pending.pop(0)[1])
+        elif kind in ("member_joined", "presence_batch"):
+            events = data.get("events") or [data]
+            for e in events:
+                started = self._joins.get((room_id, e["name"]))
+                if e["type"] == "member_joined" and started and e["name"] != name:
+                    self.join_latency.record(now - started)
+
+    async def run(self, duration):
+        end = time.monotonic() + duration
+        tasks = []
+        if self.opts["input_hz"] > 0:
+            tasks += [self._send_inputs(c, end) for c in list(self.clients)]
+        if self.opts["churn_sec"] > 0:
+            tasks += [self._churn(room_id, end) for room_id in self.room_ids]
+        await asyncio.gather(*tasks, asyncio.sleep(duration))
+
+    async def _send_inputs(self, c, end):
+        interval = 1.0 / self.opts["input_hz"]
+        pending = self._pending.setdefault((c.room_id, c.name), [])
+        seq = 0
+        await asyncio.sleep(interval * (hash(c.name) % 100) / 100.0)  # 접속자마다 시작 시점 분산
+        while time.monotonic() < end:
+            seq += 1
+            pending.append((seq, time.time()))
+            await c.comm.send_to(text_data=json.dumps({"type": "input", "seq": seq, "data": {"x": seq}}))
+            self.inputs_sent += 1
+            await asyncio.sleep(interval)
+
+    async def _churn(self, room_id, end):
+        n = 0
+        while time.monotonic() + self.opts["churn_sec"] < end:
+            await asyncio.sleep(self.opts["churn_sec"])
+            name = f"churn-{n}"
+            n += 1
+            self._joins[(room_id, name)] = time.time()
+            c = await self._join(room_id, name)
+            await asyncio.sleep(self.opts["churn_sec"] / 2)
+            self.clients.remove(c)
+            await c.close()
+
+    async def close(self):
+        for c in self.clients:
+            await c.close()
+
+    def report(self, elapsed):
+        msgs = sum(c.msgs for c in self.clients)
+        return {
+            "connections": len(self.clients),
+            "connect_sec": round(self.connect_sec, 3),
+            "msgs": msgs,
+            "msgs_per_sec": round(msgs / elapsed, 1),
+            "bytes_per_sec": round(sum(c.bytes for c in self.clients) / elapsed),
+            "inputs_sent": self.inputs_sent,
+            "input_latency_ms": self.input_latency.snapshot(),
+            "join_latency_ms": self.join_latency.snapshot(),
+        }
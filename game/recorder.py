@@ -0,0 +1,224 @@
+# game/recorder.py
+# 스트림 녹화: append-only 세그먼트 파일 + (frame_no, timestamp, offset, length) 인덱스.
+# 라이브 경로는 큐에 넣기만 하고, 디스크 쓰기는 백그라운드 스레드가 묶어서 처리한다.
+# 재생은 mmap 으로 필요한 구간만 읽는다.
+import base64
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+from . import frames
+
+INDEX = struct.Struct("!IdQI")  # frame_no, timestamp(ms), offset, length
+SEG_SUFFIX = ".seg"
+IDX_SUFFIX = ".idx"
+SAFE_ID = re.compile(r"^[0-9A-Za-z_-]{1,64}$")
+
+DEFAULTS = {
+    "ENABLED": False,
+    "DIR": None,                       # 기본: BASE_DIR / "recordings"
+    "SEGMENT_BYTES": 64 * 1024 * 1024,  # 세그먼트 파일 하나 최대 크기
+    "QUEUE_FRAMES": 600,               # 쓰기 대기열 한도 (넘치면 라이브를 막지 않고 버림)
+    "BATCH_FRAMES": 30,                # 한 번에 묶어 쓸 최대 프레임 수
+}
+
+_STOP = object()
+STOP_TIMEOUT = 5.0  # stop() 이 쓰기 스레드를 기다리는 최대 시간 (초)
+
+
+def recording_settings() -> dict:
+    conf = {**DEFAULTS, **getattr(settings, "STREAM_RECORDING", {})}
+    if conf["DIR"] is None:
+        conf["DIR"] = Path(settings.BASE_DIR) / "recordings"
+    return conf
+
+
+def room_dir(room_key) -> Path:
+    return Path(recording_settings()["DIR"]) / room_key
+
+
+class StreamRecorder:
+    def __init__(self, room_key, conf=None):
+        conf = conf or recording_settings()
+        self.segment_bytes = conf["SEGMENT_BYTES"]
+        self.batch = conf["BATCH_FRAMES"]
+        self.id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.dir = Path(conf["DIR"]) / room_key / self.id
+        self.queue = queue.Queue(maxsize=conf["QUEUE_FRAMES"])
+        self.dropped = 0
+        self.written = 0
+        self.error = None  # 마지막 쓰기 오류 (디스크 가득 참 등)
+        self._segment = -1
+        self._seg = None
+        self._idx = None
+        self._offset = 0
+        self._thread = threading.Thread(target=self._run, name=f"recorder-{self.id}", daemon=True)
+        self._thread.start()
+
+    # ---------- 라이브 경로 (이벤트 루프) ----------
+    def append(self, data: bytes):
+        """바이너리 프레임(헤더 포함) 하나."""
+        self._put(data)
+
+    def append_json(self, frame_no, payload: str, ts_ms: float):
+        """JSON/base64 프레임. 디코딩은 쓰기 스레드에서."""
+        self._put((frame_no, payload, ts_ms))
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """쓰기 스레드 종료 후 파일을 닫는다 (블로킹 → asyncio.to_thread 로 호출). 최대 timeout 초."""
+        if self._thread.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+        self._thread.join(timeout)
+
+    # ---------- 쓰기 스레드 ----------
+    def _run(self):
+        try:
+            while True:
+                items = [self.queue.get()]
+                while len(items) < self.batch:
+                    try:
+                        items.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = any(item is _STOP for item in items)
+                items = [item for item in items if item is not _STOP]
+                try:
+                    self._write(items)
+                except Exception as e:
+                    # 쓰기가 실패해도 큐는 계속 비운다 (라이브 경로/stop 이 막히지 않게). 다음 배치는 새 세그먼트로
+                    if self.error is None:
+                        print(f"❌ 녹화 쓰기 실패 {self.dir}: {e!r}")
+                    self.error = repr(e)
+                    self.dropped += len(items)
+                    self._close_segment()
+                if stop:
+                    return
+        finally:
+            self._close_segment()
+
+    def _write(self, items):
+        if not items:
+            return
+        if self._seg is None or self._offset >= self.segment_bytes:
+            self._open_segment()
+
+        blobs, index = [], []
+        offset = self._offset
+        for item in items:
+            # 잘못된 프레임 하나는 건너뛰고 나머지 배치는 쓴다
+            try:
+                if isinstance(item, tuple):
+                    frame_no, payload, ts = item
+                    frame_no = (frame_no or 0) & 0xFFFFFFFF  # 헤더와 같은 32비트 (frames.pack_frame)
+                    data = frames.pack_frame(frame_no, base64.b64decode(payload), ts=ts)
+                else:
+                    data = item
+                    frame_no, ts, _codec = frames.unpack_header(data)
+                entry = INDEX.pack(frame_no, ts, offset, len(data))
+            except Exception:
+                self.dropped += 1
+                continue
+            blobs.append(data)
+            index.append(entry)
+            offset += len(data)
+
+        self._seg.write(b"".join(blobs))
+        self._seg.flush()
+        # 인덱스는 세그먼트 데이터가 기록된 뒤에 쓴다 (인덱스가 가리키는 구간은 항상 존재)
+        self._idx.write(b"".join(index))
+        self._idx.flush()
+        self._offset = offset
+        self.written += len(blobs)
+
+    def _open_segment(self):
+        self._close_segment()
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._segment += 1
+        base = self.dir / f"{self._segment:06d}"
+        self._seg = open(base.with_suffix(SEG_SUFFIX), "ab")
+        self._idx = open(base.with_suffix(IDX_SUFFIX), "ab")
+        self._offset = 0
+
+    def _close_segment(self):
+        for f in (self._seg, self._idx):
+            if f is not None:
+                try:
+                    f.close()
+                except OSError:
+                    pass
+        self._seg = self._idx = None
+
+
+# ---------- 재생 ----------
+def read_index(path: Path):
+    """인덱스 파일 → [(frame_no, ts, offset, length), ...]"""
+    data = path.read_bytes()
+    usable = len(data) - len(data) % INDEX.size  # 쓰는 중인 마지막 레코드는 무시
+    return list(INDEX.iter_unpack(data[:usable]))
+
+
+def list_recordings(room_key):
+    base = room_dir(room_key)
+    if not base.is_dir():
+        return []
+    out = []
+    for rec in sorted(p for p in base.iterdir() if p.is_dir()):
+        segments = sorted(rec.glob("*" + IDX_SUFFIX))
+        entries = [e for seg in segments for e in read_index(seg)]
+        out.append({
+            "id": rec.name,
+            "segments": len(segments),
+            "frames": len(entries),
+            "bytes": sum(e[3] for e in entries),
+            "duration_ms": round(entries[-1][1] - entries[0][1], 1) if entries else 0,
+        })
+    return out
+
+
+class SegmentReader:
+    """녹화 하나를 세그먼트 단위로 mmap 해서 프레임을 순서대로 꺼낸다."""
+
+    def __init__(self, room_key, rec_id):
+        if not SAFE_ID.match(rec_id):
+            raise FileNotFoundError(rec_id)
+        self.dir = room_dir(room_key) / rec_id
+        if not self.dir.is_dir():
+            raise FileNotFoundError(rec_id)
+        self.segments = sorted(self.dir.glob("*" + IDX_SUFFIX))
+
+    def frames(self):
+        """(frame_no, ts, 바이너리 프레임) 제너레이터. 세그먼트 하나만 매핑해 둔다."""
+        for idx_path in self.segments:
+            entries = read_index(idx_path)
+            seg_path = idx_path.with_suffix(SEG_SUFFIX)
+            if not entries or not seg_path.exists() or os.path.getsize(seg_path) == 0:
+                continue
+            with open(seg_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for frame_no, ts, offset, length in entries:
+                    yield frame_no, ts, mm[offset:offset + length]
+
+    def frame(self, frame_no):
+        for idx_path in self.segments:
+            for no, ts, offset, length in read_index(idx_path):
+                if no == frame_no:
+                    with open(idx_path.with_suffix(SEG_SUFFIX), "rb") as f, \
+                            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        return mm[offset:offset + length]
+        return None
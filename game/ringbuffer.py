@@ -0,0 +1,63 @@
+# game/ringbuffer.py
+# 스트림별 "마지막 키프레임 + 그 뒤 델타들" 버퍼. 늦게 들어온 뷰어에게 바로 보내 첫 화면을 그린다.
+import time
+from collections import deque
+
+from django.conf import settings
+
+RING_IDLE_SEC = 60  # 이 시간 동안 프레임이 없던 스트림 버퍼는 정리
+
+
+def event_size(event) -> int:
+    return len(event.get("data") or event.get("text") or b"")
+
+
+class KeyframeRing:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.events = deque()
+        self.bytes = 0
+        self.updated = time.monotonic()
+
+    def push(self, event):
+        """프로세스당 프레임마다 한 번 (game/hub.py 에서) 호출된다."""
+        if event.get("type") in ("send_unchanged", "send_rendition"):
+            return  # 하트비트는 화면을 바꾸지 않음, 새 뷰어는 원본 단계에서 시작
+        self.updated = time.monotonic()
+
+        size = event_size(event)
+        if event.get("keyframe", True):
+            self.events.clear()
+            self.bytes = 0
+            if size > self.max_bytes:
+                return  # 키프레임 하나가 한도를 넘으면 저장하지 않음
+        elif not self.events:
+            return  # 기준 키프레임 없는 델타는 의미 없음
+
+        self.events.append(event)
+        self.bytes += size
+        # 한도 초과 시 키프레임은 남기고 오래된 델타부터 버린다
+        while self.bytes > self.max_bytes and len(self.events) > 1:
+            dropped = self.events[1]
+            del self.events[1]
+            self.bytes -= event_size(dropped)
+
+    def snapshot(self):
+        return list(self.events)
+
+
+_rings = {}
+
+
+def ring_for(group: str) -> KeyframeRing:
+    ring = _rings.get(group)
+    if ring is None:
+        _purge_idle()
+        ring = _rings[group] = KeyframeRing(getattr(settings, "STREAM_RING_BYTES", 4 * 1024 * 1024))
+    return ring
+
+
+def _purge_idle():
+    now = time.monotonic()
+    for group in [g for g, r in _rings.items() if now - r.updated > RING_IDLE_SEC]:
+        del _rings[group]
@@ -4,4 +4,7 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r"^ws/stream/$", consumers.StreamConsumer.as_asgi()),
+    re_path(r"^ws/stream/(?P<room_id>[0-9a-zA-Z_-]{1,32})/?$", consumers.StreamConsumer.as_asgi()),
+    re_path(r"^ws/replay/(?P<room_id>[0-9a-zA-Z_-]{1,32})/(?P<rec_id>[0-9a-zA-Z_-]{1,64})/?$",
+            consumers.ReplayConsumer.as_asgi()),
 ]
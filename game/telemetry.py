@@ -0,0 +1,212 @@
+# game/telemetry.py
+# 스트림 지연/처리량 계측 (프로세스 단위). GET /game/stats/ 로 노출.
+import time
+from collections import deque
+
+RATE_WINDOW_SEC = 5
+
+
+class LatencyHistogram:
+    """HDR 스타일 로그-선형 히스토그램 (µs 단위, 유효숫자 약 2자리).
+
+    0~127µs 는 1µs 단위, 그 위로는 2의 거듭제곱 구간마다 64칸으로 나눈다.
+    값 분포와 무관하게 메모리는 수백 칸 이하, 기록은 O(1).
+    """
+
+    SUB_BITS = 7
+    HALF = 1 << (SUB_BITS - 1)
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.max_us = 0
+
+    @classmethod
+    def _index(cls, us: int) -> int:
+        if us < (1 << cls.SUB_BITS):
+            return us
+        shift = us.bit_length() - cls.SUB_BITS
+        return cls.HALF * shift + (us >> shift)
+
+    @classmethod
+    def _value(cls, idx: int) -> int:
+        if idx < (1 << cls.SUB_BITS):
+            return idx
+        shift = idx // cls.HALF - 1
+        m = idx - cls.HALF * shift
+        return (m << shift) + (1 << shift) // 2  # 구간 중앙값
+
+    def record(self, seconds: float):
+        us = max(0, int(seconds * 1_000_000))
+        idx = self._index(us)
+        self.counts[idx] = self.counts.get(idx, 0) + 1
+        self.total += 1
+        if us > self.max_us:
+            self.max_us = us
+
+    def percentiles(self, *qs) -> dict:
+        """{"p50": ms, ...}"""
+        out = {f"p{q:g}": None for q in qs}
+        if not self.total:
+            return out
+        targets = sorted((q, max(1, int(self.total * q / 100.0 + 0.5))) for q in qs)
+        seen = 0
+        ti = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            while ti < len(targets) and seen >= targets[ti][1]:
+                out[f"p{targets[ti][0]:g}"] = round(min(self._value(idx), self.max_us) / 1000.0, 3)
+                ti += 1
+            if ti == len(targets):
+                break
+        return out
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.total,
+            **self.percentiles(50, 95, 99),
+            "max": round(self.max_us / 1000.0, 3),
+        }
+
+
+class RateMeter:
+    """최근 RATE_WINDOW_SEC 초 동안의 초당 건수/바이트."""
+
+    def __init__(self, window=RATE_WINDOW_SEC):
+        self.window = window
+        self.buckets = deque()   # [sec, count, bytes]
+        self.count = 0
+        self.bytes = 0
+
+    def add(self, nbytes=0, now=None):
+        sec = int(now if now is not None else time.time())
+        if self.buckets and self.buckets[-1][0] == sec:
+            self.buckets[-1][1] += 1
+            self.buckets[-1][2] += nbytes
+        else:
+            self.buckets.append([sec, 1, nbytes])
+        self.count += 1
+        self.bytes += nbytes
+        self._trim(sec)
+
+    def _trim(self, sec):
+        while self.buckets and self.buckets[0][0] <= sec - self.window:
+            self.buckets.popleft()
+
+    def rates(self, now=None):
+        self._trim(int(now if now is not None else time.time()))
+        n = sum(b[1] for b in self.buckets)
+        nbytes = sum(b[2] for b in self.buckets)
+        return n / self.window, nbytes / self.window
+
+
+class ViewerStats:
+    def __init__(self, group):
+        self.group = group
+        self.delivered = RateMeter()
+        self.dropped = 0
+        self.latency = LatencyHistogram()
+        self.rung = None
+
+    @property
+    def frames_delivered(self):
+        return self.delivered.count
+
+    def snapshot(self) -> dict:
+        fps, bps = self.delivered.rates()
+        return {
+            "group": self.group,
+            "delivered": self.delivered.count,
+            "delivered_fps": round(fps, 2),
+            "bytes_per_sec": round(bps),
+            "dropped": self.dropped,
+            "latency_ms": self.latency.snapshot(),
+            "rung": self.rung,
+        }
+
+
+class StreamStats:
+    def __init__(self):
+        self.ingest = RateMeter()
+        self.delivered = RateMeter()
+        self.dropped = 0
+        self.latency = LatencyHistogram()
+
+    def snapshot(self) -> dict:
+        in_fps, in_bps = self.ingest.rates()
+        out_fps, out_bps = self.delivered.rates()
+        return {
+            "ingested": self.ingest.count,
+            "ingest_fps": round(in_fps, 2),
+            "ingest_bytes_per_sec": round(in_bps),
+            "delivered": self.delivered.count,
+            "delivered_fps": round(out_fps, 2),
+            "delivered_bytes_per_sec": round(out_bps),
+            "dropped": self.dropped,
+            "latency_ms": self.latency.snapshot(),
+        }
+
+
+_streams = {}
+_viewers = {}
+
+
+def stream(group) -> StreamStats:
+    st = _streams.get(group)
+    if st is None:
+        st = _streams[group] = StreamStats()
+    return st
+
+
+def viewer_connected(channel_name, group) -> ViewerStats:
+    vs = _viewers[channel_name] = ViewerStats(group)
+    return vs
+
+
+def viewer_disconnected(channel_name):
+    _viewers.pop(channel_name, None)
+
+
+def record_ingest(group, nbytes):
+    stream(group).ingest.add(nbytes)
+
+
+def record_delivery(vs: ViewerStats, nbytes, ingest_ts):
+    st = stream(vs.group)
+    vs.delivered.add(nbytes)
+    st.delivered.add(nbytes)
+    if ingest_ts:
+        latency = max(0.0, time.time() - ingest_ts)
+        vs.latency.record(latency)
+        st.latency.record(latency)
+
+
+def record_drop(vs: ViewerStats, n=1):
+    vs.dropped += n
+    stream(vs.group).dropped += n
+
+
+def _purge_idle():
+    # 최근 구간에 기록이 없고 보고 있는 뷰어도 없는 스트림은 정리
+    watched = {vs.group for vs in _viewers.values()}
+    now = time.time()
+    for group in list(_streams):
+        st = _streams[group]
+        if group not in watched and st.ingest.rates(now)[0] == 0 and st.delivered.rates(now)[0] == 0:
+            del _streams[group]
+
+
+def snapshot() -> dict:
+    _purge_idle()
+    return {
+        "streams": {g: st.snapshot() for g, st in _streams.items()},
+        "viewers": {ch: vs.snapshot() for ch, vs in _viewers.items()},
+    }
+
+
+def reset():
+    _streams.clear()
+    for vs in _viewers.values():
+        vs.delivered = RateMeter()
+        vs.dropped = 0
+        vs.latency = LatencyHistogram()
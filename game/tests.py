@@ -0,0 +1,132 @@
+import base64
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase
+
+from . import frames, telemetry
+from .chunks import CHUNK_TYPE, Reassembler, split_event
+from .recorder import DEFAULTS as RECORDING_DEFAULTS
+from .recorder import IDX_SUFFIX, StreamRecorder, read_index
+
+
+def frame_event(key, data, **extra):
+    return {"type": "send_frame_bytes", "group": "stream_1", "origin": "w1", "key": key, "frame_no": 1, "data": data, **extra}
+
+
+class SplitEventTests(SimpleTestCase):
+    def test_small_event_is_not_split(self):
+        event = frame_event("a:1", b"x" * 10)
+        self.assertEqual(split_event(event, size=100), [event])
+
+    def test_parts_fit_chunk_size(self):
+        messages = split_event(frame_event("a:1", b"x" * 250), size=100)
+        self.assertEqual([m["seq"] for m in messages], [0, 1, 2])
+        self.assertTrue(all(m["type"] == CHUNK_TYPE and len(m["part"]) <= 100 for m in messages))
+        # 메타는 첫 조각에만, 페이로드는 메타에 들어가지 않는다
+        self.assertNotIn("data", messages[0]["meta"])
+        self.assertTrue(all("meta" not in m for m in messages[1:]))
+
+    def test_rendition_is_chunked_like_a_frame(self):
+        event = frame_event("a:1", b"r" * 250, type="send_rendition", rung="half")
+        messages = split_event(event, size=100)
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(all(m["lane"] == "half" for m in messages))
+
+
+class ReassemblerTests(SimpleTestCase):
+    def feed_all(self, r, messages):
+        return [r.feed(m) for m in messages]
+
+    def test_reassembles_bytes(self):
+        event = frame_event("a:1", bytes(range(256)) * 3)
+        out = self.feed_all(Reassembler(), split_event(event, size=100))
+        self.assertEqual(out[:-1], [None] * (len(out) - 1))
+        self.assertEqual(out[-1], event)
+
+    def test_reassembles_text(self):
+        event = {"type": "send_frame", "group": "g", "origin": "w1", "key": "a:1", "text": "한글" * 100}
+        out = self.feed_all(Reassembler(), split_event(event, size=64))
+        self.assertEqual(out[-1], event)
+
+    def test_newer_frame_drops_incomplete(self):
+        r = Reassembler()
+        old = split_event(frame_event("a:1", b"o" * 300), size=100)
+        new = frame_event("a:2", b"n" * 300)
+        r.feed(old[0])
+        r.feed(old[1])
+        out = self.feed_all(r, split_event(new, size=100))
+        self.assertEqual(out[-1], new)
+        # 이전 프레임의 남은 조각은 조립되지 않는다
+        self.assertIsNone(r.feed(old[2]))
+
+    def test_missing_first_chunk(self):
+        r = Reassembler()
+        messages = split_event(frame_event("a:1", b"x" * 300), size=100)
+        self.assertEqual(self.feed_all(r, messages[1:]), [None, None])
+        self.assertEqual(r.partial, {})
+
+    def test_rendition_lane_does_not_clobber_frame(self):
+        r = Reassembler()
+        frame = frame_event("a:2", b"f" * 300)
+        rendition = frame_event("a:1", b"h" * 300, type="send_rendition", rung="half")
+        done = []
+        # 다른 태스크가 보낸 조각이 섞여 도착
+        for a, b in zip(split_event(frame, size=100), split_event(rendition, size=100)):
+            done += [e for e in (r.feed(a), r.feed(b)) if e is not None]
+        self.assertCountEqual(done, [frame, rendition])
+
+
+class RecorderTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.recorder = StreamRecorder("room", {**RECORDING_DEFAULTS, "DIR": self.tmp.name})
+
+    def index(self):
+        return [e for p in sorted(Path(self.recorder.dir).glob("*" + IDX_SUFFIX)) for e in read_index(p)]
+
+    def test_out_of_range_frame_no_does_not_drop_batch(self):
+        payload = base64.b64encode(b"jpeg").decode()
+        for frame_no in (1, -1, 2**32 + 5, 2):
+            self.recorder.append_json(frame_no, payload, 1000.0)
+        self.recorder.stop()
+        self.assertEqual((self.recorder.written, self.recorder.dropped), (4, 0))
+        # 헤더와 같이 32비트로 접힌다
+        self.assertEqual([e[0] for e in self.index()], [1, 0xFFFFFFFF, 5, 2])
+
+    def test_bad_item_is_skipped(self):
+        self.recorder.append_json(1, "!!!not base64", 1000.0)
+        self.recorder.append(b"short")
+        self.recorder.append_json(2, base64.b64encode(b"ok").decode(), 1000.0)
+        self.recorder.stop()
+        self.assertEqual((self.recorder.written, self.recorder.dropped), (1, 2))
+        self.assertIsNone(self.recorder.error)
+
+
+class ConversionMemoTests(SimpleTestCase):
+    def test_one_conversion_per_event_across_streams(self):
+        # 스트림이 많아도 (이벤트 하나를 여러 뷰어가 변환) 이벤트당 한 번
+        events = [frame_event(f"s{i}:1", frames.pack_frame(i, b"jpeg")) for i in range(50)]
+        before = frames.STATS.conversions
+        for _viewer in range(3):
+            texts = [frames.binary_to_json_text(e["data"], e) for e in events]
+        self.assertEqual(frames.STATS.conversions - before, 50)
+        self.assertEqual(texts[7], frames.binary_to_json_text(events[7]["data"]))
+
+
+class StreamStatsViewTests(SimpleTestCase):
+    def setUp(self):
+        telemetry.record_ingest("stream_t", 100)
+        self.addCleanup(telemetry.reset)
+
+    def test_get_does_not_reset(self):
+        response = self.client.get("/game/stats/?reset=1")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("stream_t", telemetry.snapshot()["streams"])
+
+    def test_post_resets(self):
+        response = self.client.post("/game/stats/")
+        self.assertIn("stream_t", response.json()["streams"])  # 초기화 전 값
+        self.assertNotIn("stream_t", telemetry.snapshot()["streams"])
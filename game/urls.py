@@ -1,6 +1,10 @@
 from django.urls import path, include
-from .views import game_view
+from .views import game_view, stream_stats, replay_list, replay_frame
 
 urlpatterns = [
     path("", game_view),
+    path("stats/", stream_stats),
+    path("replay/<slug:room_id>/", replay_list),
+    path("replay/<slug:room_id>/<slug:rec_id>/<int:frame_no>/", replay_frame),
+    path("<slug:room_id>/", game_view),
 ]
\ No newline at end of file
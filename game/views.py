@@ -1,6 +1,15 @@
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_http_methods
 
-def game_view(request):
+from rooms import redis_pool
+
+from . import chunks, frames, telemetry
+from .recorder import SegmentReader, list_recordings
+
+def game_view(request, room_id=None):
+    # /game/<room_id>/ 이면 해당 방 스트림만 구독
+    stream_path = f"ws/stream/{room_id}/" if room_id else "ws/stream/"
     html = """
     <!DOCTYPE html>
     <html lang="ko">
@@ -27,22 +36,93 @@ def game_view(request):
     <body>
         <h1>🎮 실시간 게임 화면</h1>
         <p id="frameinfo"></p>
-        <img id="screen" alt="게임 화면 로딩중...">
+        <canvas id="screen" width="640" height="480"></canvas>
 
         <script>
-            let ws = new WebSocket("ws://127.0.0.1:8000/ws/stream/");
+            // 바이너리 프레임 헤더: frame_no(u32) + timestamp(f64) + codec(u8), big-endian
+            const HEADER_SIZE = 13;
+            const CODEC_MIME = {0: "image/jpeg", 1: "image/png", 2: "image/webp"};
+            const CODEC_DELTA = 16;
+            const CODEC_UNCHANGED = 17;
+            const canvas = document.getElementById("screen");
+            const ctx = canvas.getContext("2d");
+            let keyframe = null;              // 델타가 기준으로 삼는 마지막 키프레임
+            let render = Promise.resolve();   // 디코딩은 비동기라 프레임 순서대로 그리기
+
+            // ack=1: 그린 프레임마다 ack → 서버는 ack 안 된 프레임이 한도면 최신 프레임만 남기고 기다린다
+            let ws = new WebSocket("ws://127.0.0.1:8000/__STREAM_PATH__?mode=binary&ack=1");
+            ws.binaryType = "arraybuffer";
+
+            function ack(frameNo) {
+                if (ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify({ack: frameNo}));
+            }
 
             ws.onopen = () => {
                 console.log("✅ WebSocket 연결됨");
             };
 
+            function showFrameNo(frameNo) {
+                document.getElementById("frameinfo").innerText = "Frame #" + frameNo;
+            }
+
+            function drawKeyframe(bitmap) {
+                if (keyframe) keyframe.close();
+                keyframe = bitmap;
+                canvas.width = bitmap.width;
+                canvas.height = bitmap.height;
+                ctx.drawImage(bitmap, 0, 0);
+            }
+
+            // 델타 바디: width, height, tile, n (u16 x4) + 타일마다 tx, ty (u16), len (u32), jpeg
+            async function drawDelta(buf) {
+                if (!keyframe) return;
+                const view = new DataView(buf, HEADER_SIZE);
+                const tile = view.getUint16(4), n = view.getUint16(6);
+                let off = HEADER_SIZE + 8;
+                const jobs = [];
+                for (let i = 0; i < n; i++) {
+                    const tv = new DataView(buf, off);
+                    const tx = tv.getUint16(0), ty = tv.getUint16(2), len = tv.getUint32(4);
+                    const blob = new Blob([buf.slice(off + 8, off + 8 + len)], {type: "image/jpeg"});
+                    jobs.push(createImageBitmap(blob).then(bm => [tx, ty, bm]));
+                    off += 8 + len;
+                }
+                const tiles = await Promise.all(jobs);
+                ctx.drawImage(keyframe, 0, 0);
+                for (const [tx, ty, bm] of tiles) {
+                    ctx.drawImage(bm, tx * tile, ty * tile);
+                    bm.close();
+                }
+            }
+
             ws.onmessage = (event) => {
+                if (event.data instanceof ArrayBuffer) {
+                    const buf = event.data;
+                    const view = new DataView(buf);
+                    const frameNo = view.getUint32(0);
+                    const codec = view.getUint8(12);
+                    if (codec === CODEC_UNCHANGED) {
+                        // 직전 프레임과 같음: 화면은 그대로, 번호만 갱신
+                    } else if (codec === CODEC_DELTA) {
+                        render = render.then(() => drawDelta(buf));
+                    } else {
+                        const blob = new Blob([buf.slice(HEADER_SIZE)], {type: CODEC_MIME[codec] || "image/jpeg"});
+                        render = render.then(() => createImageBitmap(blob)).then(drawKeyframe);
+                    }
+                    render = render.catch(e => console.warn(e)).then(() => { showFrameNo(frameNo); ack(frameNo); });
+                    return;
+                }
+
                 let msg = JSON.parse(event.data);
                 if (msg.payload) {
-                    document.getElementById("screen").src = "data:image/jpeg;base64," + msg.payload;
+                    const img = new Image();
+                    img.onload = () => createImageBitmap(img).then(drawKeyframe).finally(() => ack(msg.frame_no));
+                    img.src = "data:image/jpeg;base64," + msg.payload;
+                } else if (msg.unchanged) {
+                    ack(msg.frame_no);
                 }
                 if (msg.frame_no !== undefined) {
-                    document.getElementById("frameinfo").innerText = "Frame #" + msg.frame_no;
+                    showFrameNo(msg.frame_no);
                 }
             };
 
@@ -52,5 +132,50 @@ def game_view(request):
         </script>
     </body>
     </html>
-    """
+    """.replace("__STREAM_PATH__", stream_path)
     return HttpResponse(html)
+
+
+
+@never_cache
+@require_http_methods(["GET", "POST"])
+def stream_stats(request):
+    """
+    GET /game/stats/   (이 워커 프로세스 기준)
+    스트림별 ingest/delivered fps, bytes/s, 드랍 수, 수신→전송 지연 p50/p95/p99 (ms)
+    "redis": 공용 Redis 풀 사용 중/대기/오류 수
+    POST /game/stats/ 이면 조회 후 카운터 초기화 (GET 은 읽기만, 크롤러/대시보드 새로고침이 지우지 않게)
+    """
+    data = {
+        "serialize": frames.STATS.snapshot(),
+        "chunks": dict(chunks.STATS),
+        "redis": redis_pool.metrics(),
+        **telemetry.snapshot(),
+    }
+    if request.method == "POST":
+        telemetry.reset()
+    return JsonResponse(data)
+
+
+
+def replay_list(request, room_id):
+    """
+    GET /game/replay/<room_id>/
+    녹화 목록: [{"id","segments","frames","bytes","duration_ms"}]
+    """
+    return JsonResponse({"roomId": room_id, "recordings": list_recordings(room_id)})
+
+
+def replay_frame(request, room_id, rec_id, frame_no):
+    """
+    GET /game/replay/<room_id>/<rec_id>/<frame_no>/
+    녹화된 프레임 하나를 이미지로 반환 (세그먼트를 mmap 으로 읽음)
+    """
+    try:
+        data = SegmentReader(room_id, rec_id).frame(frame_no)
+    except FileNotFoundError:
+        data = None
+    if data is None:
+        raise Http404("frame not found")
+    _no, _ts, codec = frames.unpack_header(data)
+    return HttpResponse(frames.frame_body(data), content_type=frames.CODEC_MIME.get(codec, "image/jpeg"))
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class RoomsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rooms'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from . import cache as room_cache
+        from .jwt_ws_middleware import user_deleted, user_saved
+        from .models import Room, User
+
+        # 비활성화/삭제된 사용자의 WebSocket 토큰 캐시 제거
+        post_save.connect(user_saved, sender=User, dispatch_uid="ws_token_cache_user_saved")
+        post_delete.connect(user_deleted, sender=User, dispatch_uid="ws_token_cache_user_deleted")
+
+        # 방 생성/상태 변경/삭제 시 목록·상세 응답 캐시 무효화
+        post_save.connect(room_cache.invalidate, sender=Room, dispatch_uid="room_cache_saved")
+        post_delete.connect(room_cache.invalidate, sender=Room, dispatch_uid="room_cache_deleted")
@@ -0,0 +1,66 @@
+# rooms/cache.py
+# 방 목록/상세 응답 캐시.
+# - DB 조회 + 직렬화 결과를 Django 캐시에 (세대 번호 + 요청 URL) 키로 저장한다.
+#   목록의 next/previous 는 요청 호스트로 만든 절대 URL 이라 경로만이 아니라 scheme/host 까지 키에 넣는다.
+# - 방이 생성/수정/삭제되면 Redis 의 세대 번호를 올려 모든 워커의 기존 항목을 한 번에 무효화한다.
+# - 실시간 인원(count)은 캐시 뒤에서 매번 합치고, 최종 본문 해시로 ETag / 304 를 처리한다.
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from .redis_pool import get_sync_redis
+
+K_GENERATION = "rooms:cache:gen"
+
+
+def cache_ttl() -> int:
+    return getattr(settings, "ROOM_CACHE_TTL", 60)
+
+
+def generation():
+    """현재 세대 번호. Redis 를 못 쓰면 None (캐시 사용 안 함)."""
+    try:
+        return int(get_sync_redis().get(K_GENERATION) or 0)
+    except Exception as e:
+        print(f"❌ 방 캐시 세대 조회 실패 (캐시 사용 안 함): {e!r}")
+        return None
+
+
+def invalidate(*args, **kwargs):
+    """Room post_save / post_delete (rooms/apps.py 에서 연결)."""
+    try:
+        get_sync_redis().incr(K_GENERATION)
+    except Exception as e:
+        print(f"❌ 방 캐시 무효화 실패: {e!r}")
+
+
+def cache_key(kind, gen, request) -> str:
+    url = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    return f"rooms:{kind}:{gen}:{url}"
+
+
+def cached(kind, request, build):
+    """build() 결과(DB 부분)를 캐시에서 꺼내거나 만들어 저장."""
+    gen = generation()
+    if gen is None:
+        return build()
+    key = cache_key(kind, gen, request)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, cache_ttl())
+    return data
+
+
+def conditional_response(request, data) -> Response:
+    """본문 해시 ETag. If-None-Match 가 맞으면 본문 없이 304."""
+    body = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode()
+    etag = '"%s"' % hashlib.sha1(body).hexdigest()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}  # 매번 재검증 (인원이 실시간이라)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        return Response(status=304, headers=headers)
+    return Response(data, headers=headers)
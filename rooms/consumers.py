@@ -1,22 +1,24 @@
 # rooms/consumers.py (발췌)
-import asyncio
 import json
-from redis.asyncio import Redis
 from channels.generic.websocket import AsyncWebsocketConsumer
 from urllib.parse import parse_qs
 
-def k_members(room_id):      return f"room:{room_id}:members"
-def k_conns(room_id, name):  return f"room:{room_id}:conns:{name}"
+from .presence import (
+    PROTOCOLS, k_members, room_group, default_protocol, sort_members, lease_id, join, leave,
+    snapshot, snapshot_payload, count_payload, publish_deltas, ticker_acquire, ticker_release,
+)
+from .redis_pool import get_redis
+from .sim import parse_input, push_input, sim_settings
 
 class RoomConsumer(AsyncWebsocketConsumer):
-    redis: Redis = None
     TICK_SEC = 2
 
     async def connect(self):
         self.room_id = self.scope["url_route"]["kwargs"]["room_id"]
-        self.group = f"room_{self.room_id}"
+        self.group = room_group(self.room_id)
         self.joined = False
-        self.ticker = None
+        self.ticking = False
+        self.redis = None
 
         # name 쿼리
         query = parse_qs((self.scope.get("query_string") or b"").decode())
@@ -24,27 +26,36 @@ class RoomConsumer(AsyncWebsocketConsumer):
         if not self.name:
             await self.close(code=4400); return
 
-        # Redis 준비
-        if not RoomConsumer.redis:
-            from django.conf import settings
-            url = getattr(settings, "REDIS_URL", "redis://127.0.0.1:6379/0")
-            RoomConsumer.redis = Redis.from_url(url, decode_responses=True)
+        # presence 프로토콜 (delta: 증분 이벤트, count: 기존 presence_count 호환)
+        self.proto = (query.get("proto") or [default_protocol()])[0]
+        if self.proto not in PROTOCOLS:
+            self.proto = default_protocol()
+        self.ver = 0          # 호환 모드용 로컬 사본
+        self.members = set()
+        self.lease = lease_id(self.name)  # 연결 리스 (하트비트로 연장, 끊기면 스위퍼가 정리)
 
+        # Redis 준비 (루프 공용 풀, rooms/redis_pool.py)
+        self.redis = get_redis()
+        self.sim_conf = sim_settings()
+
+        # 스냅샷보다 먼저 그룹에 들어가야 그 사이 증분을 놓치지 않는다
         await self.channel_layer.group_add(self.group, self.channel_name)
         await self.accept()
 
-        # 멀티탭 카운트 관리
-        n = await RoomConsumer.redis.incr(k_conns(self.room_id, self.name))
-        if n == 1:
-            await RoomConsumer.redis.sadd(k_members(self.room_id), self.name)
+        # 멀티탭 카운트 관리 (첫 탭일 때만 멤버 추가 + 버전 증가) → 갱신된 스냅샷까지 한 번에
+        changed, self.ver, members = await join(self.redis, self.room_id, self.name, self.lease)
+        self.members = set(members)
+        if changed:
+            await publish_deltas(self.redis, self.room_id)
 
         self.joined = True
 
-        # ✅ 입장 즉시 현재 카운트 브로드캐스트
-        await self._broadcast_count()
+        # ✅ 접속한 소켓에게만 전체 목록
+        await self._send_snapshot(members)
 
-        # ✅ 2초마다 카운트만 브로드캐스트
-        self.ticker = asyncio.create_task(self._count_ticker())
+        # ✅ 2초마다 리스 연장 + (ver, count) 브로드캐스트 (방당 티커 하나, 워커 간 리스로 한 곳만 전송)
+        ticker_acquire(self.redis, self.room_id, self.TICK_SEC, self.lease, self.name)
+        self.ticking = True
 
     async def disconnect(self, code):
         try:
@@ -52,62 +63,82 @@ class RoomConsumer(AsyncWebsocketConsumer):
         except Exception:
             pass
 
-        if self.ticker:
-            try:
-                self.ticker.cancel()
-                await self.ticker
-            except Exception:
-                pass
+        if self.ticking:
+            self.ticking = False
+            await ticker_release(self.room_id, self.lease)
 
-        if not self.joined or RoomConsumer.redis is None:
+        if not self.joined or self.redis is None:
             return
 
-        # 멀티탭 감소 & 필요 시 멤버 제거
-        n = await RoomConsumer.redis.decr(k_conns(self.room_id, self.name))
-        if n <= 0:
-            pipe = RoomConsumer.redis.pipeline()
-            pipe.delete(k_conns(self.room_id, self.name))
-            pipe.srem(k_members(self.room_id), self.name)
-            await pipe.execute()
-
-        # ✅ 퇴장 즉시 카운트 브로드캐스트
-        await self._broadcast_count()
+        # 멀티탭 감소 & 마지막 탭이면 멤버 제거 + 버전 증가
+        changed, _, _ = await leave(self.redis, self.room_id, self.name, self.lease)
+        if changed:
+            # ✅ 퇴장 즉시 증분 브로드캐스트
+            await publish_deltas(self.redis, self.room_id)
 
-    # ---------- broadcast helpers ----------
+    # ---------- snapshot ----------
     async def _get_count(self) -> int:
-        return await RoomConsumer.redis.scard(k_members(self.room_id))
-
-    async def _broadcast_count(self):
-        # 현재 접속자 수 + 사용자 목록 가져오기
-        names = await RoomConsumer.redis.smembers(k_members(self.room_id))
-        members = sorted(names, key=lambda s: s.lower())  # 보기 좋게 정렬
-        cnt = len(members)
-
-        await self.channel_layer.group_send(self.group, {
-            "type": "room.presence_count",
-            "payload": {
-                "type": "presence_count",
-                "roomId": self.room_id,
-                "count": cnt,
-                "members": members,  # ✅ 사용자 이름들 같이 전송
-            },
-        })
-
-    async def room_presence_count(self, event):
-        await self.send(json.dumps(event["payload"]))
-    async def room_presence_count(self, event):
-        await self.send(json.dumps(event["payload"]))
-
-    async def _count_ticker(self):
-        try:
-            while self.joined:
-                await asyncio.sleep(self.TICK_SEC)
-                await self._broadcast_count()
-        except asyncio.CancelledError:
-            pass
+        return await self.redis.scard(k_members(self.room_id))
+
+    async def _load_snapshot(self):
+        self.ver, members = await snapshot(self.redis, self.room_id)
+        self.members = set(members)
+        return members
+
+    async def _send_snapshot(self, members=None):
+        if members is None:
+            members = await self._load_snapshot()
+        if self.proto == "count":
+            await self.send(json.dumps(count_payload(self.room_id, members)))
+        else:
+            await self.send(json.dumps(snapshot_payload(self.room_id, self.ver, members)))
+
+    async def _send_count(self):
+        await self.send(json.dumps(count_payload(self.room_id, sort_members(self.members))))
+
+    # ---------- group handlers ----------
+    async def room_presence_event(self, event):
+        if self.proto == "delta":
+            await self.send(event["text"])
+            return
 
-    # 선택: 클라가 "who" 보내면 즉시 count만 응답
+        # 호환 모드: 로컬 목록에 반영하고 (묶음이어도) 기존 presence_count 한 번
+        changed = False
+        for kind, name, ver in event["events"]:
+            if ver <= self.ver:
+                continue  # 스냅샷에 이미 반영된 이벤트
+            changed = True
+            if ver != self.ver + 1:
+                await self._load_snapshot()  # 버전 틈 → 다시 읽기
+                break
+            self.ver = ver
+            if kind == "member_joined":
+                self.members.add(name)
+            else:
+                self.members.discard(name)
+        if changed:
+            await self._send_count()
+
+    async def room_presence_tick(self, event):
+        if self.proto == "delta":
+            await self.send(event["text"])
+            return
+        if event["ver"] != self.ver:
+            await self._load_snapshot()
+        await self._send_count()
+
+    async def room_sim_tick(self, event):
+        await self.send(event["text"])
+
+    # {"type":"input","seq":N,"data":...} → 서버 틱에 모아서 방송 (rooms/sim.py)
+    # 선택: 클라가 "who" / {"type":"snapshot"} 보내면 요청한 소켓에게만 전체 목록
     async def receive(self, text_data=None, bytes_data=None):
+        if text_data and text_data.startswith("{") and '"input"' in text_data:
+            item = parse_input(text_data, self.name, self.sim_conf["MAX_INPUT_BYTES"])
+            if item is not None:
+                push_input(self.redis, self.room_id, item)
+                return
+
         txt = (text_data or "").strip().lower()
-        if txt == "who" or '"type":"who"' in txt:
-            await self._broadcast_count()
\ No newline at end of file
+        if txt == "who" or '"type":"who"' in txt or '"type":"snapshot"' in txt:
+            await self._send_snapshot()
@@ -0,0 +1,80 @@
+# rooms/hashing.py
+# 비밀번호 해시/검증을 이벤트 루프와 요청 스레드 밖(프로세스 풀)에서.
+# PBKDF2 는 일부러 느리므로 로그인 몰림이 다른 HTTP 요청까지 막지 않도록 코어 수만큼 병렬로 돌리고,
+# 대기열이 한도를 넘으면 바로 Overloaded (→ 429) 로 돌려보낸다.
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from .procpool import SpawnPool
+
+DEFAULTS = {
+    "WORKERS": 2,       # 해시 프로세스 수
+    "MAX_PENDING": 32,  # 실행 중 + 대기 중 최대 요청 수 (넘치면 429)
+}
+
+
+class Overloaded(Exception):
+    pass
+
+
+def hashing_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "AUTH_HASHING", {})}
+
+
+# ---------- 워커 프로세스 ----------
+def _init_worker(settings_module):
+    # PASSWORD_HASHERS 등 설정을 쓰려면 워커에서도 Django 초기화가 필요
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    django.setup()
+
+
+def _make(password):
+    from django.contrib.auth.hashers import make_password
+    return make_password(password)
+
+
+def _check(password, encoded):
+    """(일치 여부, 다시 해시해야 하는지). 알고리즘이 바뀌었거나 반복 횟수가 오르면 후자가 True."""
+    from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher
+    if not check_password(password, encoded):
+        return False, False
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return True, False
+    preferred = get_hasher("default")
+    return True, hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+# ---------- 이벤트 루프 쪽 ----------
+pool = SpawnPool(
+    lambda: hashing_settings()["WORKERS"],
+    initializer=_init_worker,
+    initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings"),),
+)
+_pending = 0
+
+
+async def _run(fn, *args):
+    global _pending
+    if _pending >= hashing_settings()["MAX_PENDING"]:
+        raise Overloaded()
+    _pending += 1
+    try:
+        return await pool.run(fn, *args)
+    except BrokenProcessPool:
+        raise Overloaded()  # 새 풀도 바로 깨짐 → 잠시 후 재시도 (429)
+    finally:
+        _pending -= 1
+
+
+async def make_password(password) -> str:
+    return await _run(_make, password)
+
+
+async def check_password(password, encoded):
+    """(일치 여부, 다시 해시해야 하는지)"""
+    return await _run(_check, password, encoded)
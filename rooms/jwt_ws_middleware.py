@@ -1,13 +1,50 @@
 # rooms/jwt_ws_middleware.py
+# ?token=<access> 로 WebSocket 사용자 인증.
+# 검증된 토큰 → 사용자 를 LRU+TTL 캐시에 두어 재접속 폭주 때 서명 검증/DB 조회를 반복하지 않는다.
+# 캐시 항목은 토큰 exp (최대 CACHE_TTL 초) 에 만료된다.
+# 사용자가 비활성화/삭제되면 Redis 의 사용자별 리비전(ws_auth:rev:{uid})을 올리고, 캐시 적중 때마다
+# 저장 당시 리비전과 비교해 모든 워커가 다음 접속부터 바로 거절한다 (signal 은 저장한 프로세스에서만 온다).
+import threading
+import time
+from collections import OrderedDict
 from urllib.parse import parse_qs
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from channels.db import database_sync_to_async
+from rest_framework_simplejwt.models import TokenUser
 from rest_framework_simplejwt.tokens import UntypedToken
 from rest_framework_simplejwt.settings import api_settings
 
+from .redis_pool import get_redis, get_sync_redis
+
 User = get_user_model()
 
+DEFAULTS = {
+    "CACHE_SIZE": 10000,   # 최대 캐시 토큰 수 (LRU)
+    "CACHE_TTL": 300,      # 토큰 exp 와 별개로 항목 최대 유지 시간 (초)
+    "CLAIMS_ONLY": False,  # True 면 DB 조회 없이 토큰 클레임으로 TokenUser 생성
+}
+
+
+def ws_auth_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "WS_JWT_AUTH", {})}
+
+
+def k_user_rev(uid):
+    return f"ws_auth:rev:{uid}"
+
+
+async def user_revision(uid):
+    """사용자 리비전. Redis 를 못 쓰면 None (캐시 사용 안 함)."""
+    try:
+        return int(await get_redis().get(k_user_rev(uid)) or 0)
+    except Exception as e:
+        print(f"❌ ws 인증 리비전 조회 실패 (캐시 사용 안 함): {e!r}")
+        return None
+
+
 @database_sync_to_async
 def get_user_async(uid):
     try:
@@ -15,6 +52,123 @@ def get_user_async(uid):
     except User.DoesNotExist:
         return AnonymousUser()
 
+
+class TokenUserCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()  # token -> (user, uid, expires_at, rev)
+        self.by_user = {}             # uid -> {token, ...}
+        self.lock = threading.Lock()  # signal 은 동기 스레드에서 올 수 있음
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        """(user, uid, rev) 또는 None."""
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None or entry[2] <= time.time():
+                if entry is not None:
+                    self._drop(token)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(token)
+            self.hits += 1
+            return entry[0], entry[1], entry[3]
+
+    def put(self, token, user, uid, expires_at, rev):
+        with self.lock:
+            if token in self.entries:
+                self._drop(token)
+            self.entries[token] = (user, uid, expires_at, rev)
+            self.by_user.setdefault(uid, set()).add(token)
+            while len(self.entries) > self.max_size:
+                self._drop(next(iter(self.entries)))
+
+    def invalidate_user(self, uid):
+        with self.lock:
+            for token in self.by_user.pop(str(uid), ()):
+                self.entries.pop(token, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_user.clear()
+
+    def _drop(self, token):
+        _user, uid, _exp, _rev = self.entries.pop(token)
+        tokens = self.by_user.get(uid)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self.by_user[uid]
+
+
+token_cache = TokenUserCache(ws_auth_settings()["CACHE_SIZE"])
+
+
+# ---------- 무효화 (rooms/apps.py 에서 signal 연결) ----------
+def revoke_user(uid):
+    """이 프로세스 캐시를 비우고 리비전을 올려 다른 워커의 캐시 항목도 무효화."""
+    token_cache.invalidate_user(uid)
+    try:
+        pipe = get_sync_redis().pipeline(transaction=True)
+        pipe.incr(k_user_rev(uid))
+        # 캐시 항목보다 오래만 살면 된다 (키가 사라져 0 으로 돌아가도 불일치 → 다시 인증일 뿐)
+        pipe.expire(k_user_rev(uid), ws_auth_settings()["CACHE_TTL"] * 2)
+        pipe.execute()
+    except Exception as e:
+        print(f"❌ ws 인증 캐시 무효화 실패 uid={uid}: {e!r}")
+
+
+def user_saved(sender, instance, **kwargs):
+    if not instance.is_active:
+        revoke_user(instance.pk)
+
+
+def user_deleted(sender, instance, **kwargs):
+    revoke_user(instance.pk)
+
+
+def _resolve_uid(payload):
+    # 기본: SIMPLE_JWT.USER_ID_CLAIM (기본 'user_id')
+    uid = payload.get(api_settings.USER_ID_CLAIM)
+    # 혹시 커스텀 발급 코드가 'id'나 'sub'로 넣었을 수 있으니 fallback
+    if uid is None:
+        uid = payload.get("id") or payload.get("sub") or payload.get("userId")
+    return uid
+
+
+async def authenticate(token):
+    cached = token_cache.get(token)
+    if cached is not None:
+        user, uid, rev = cached
+        if rev == await user_revision(uid):
+            return user
+        token_cache.invalidate_user(uid)  # 다른 워커에서 비활성화/삭제됨 (또는 Redis 오류)
+
+    conf = ws_auth_settings()
+    ut = UntypedToken(token)  # 서명/만료 검증 (여기서 만료면 예외)
+    payload = ut.payload
+    uid = _resolve_uid(payload)
+    if uid is None:
+        print("[MW] uid not found in payload:", sorted(payload))
+        return AnonymousUser()
+
+    # DB 조회보다 먼저 읽어야 그 사이의 비활성화가 다음 적중에서 걸린다
+    rev = await user_revision(uid)
+    if conf["CLAIMS_ONLY"]:
+        user = TokenUser(ut)
+    else:
+        user = await get_user_async(uid)
+        if not user.is_authenticated or not user.is_active:
+            return AnonymousUser()  # 없는/비활성 사용자는 캐시하지 않음
+
+    if rev is not None:
+        expires_at = min(payload.get("exp", 0) or 0, time.time() + conf["CACHE_TTL"])
+        token_cache.put(token, user, str(uid), expires_at, rev)
+    return user
+
+
 class JWTQueryAuthMiddleware:
     def __init__(self, app):
         self.app = app
@@ -25,31 +179,9 @@ class JWTQueryAuthMiddleware:
         try:
             query = parse_qs(scope.get("query_string", b"").decode() or "")
             token = (query.get("token") or [None])[0]
-            print("[MW] query:", query)  # 🔎
-
             if token:
-                ut = UntypedToken(token)  # 서명/만료 검증 (여기서 만료면 예외)
-                payload = ut.payload
-                print("[MW] payload keys:", list(payload.keys()))  # 🔎
-                print("[MW] payload:", payload)                    # 🔎
-
-                # 기본: SIMPLE_JWT.USER_ID_CLAIM (기본 'user_id')
-                claim_key = api_settings.USER_ID_CLAIM
-                uid = payload.get(claim_key)
-
-                # 혹시 커스텀 발급 코드가 'id'나 'sub'로 넣었을 수 있으니 fallback
-                if uid is None:
-                    uid = payload.get("id") or payload.get("sub") or payload.get("userId")
-
-                print("[MW] uid resolved:", uid)  # 🔎
-
-                if uid is not None:
-                    user = await get_user_async(uid)
-                    scope["user"] = user
-                else:
-                    print("[MW] uid not found in payload")
-
+                scope["user"] = await authenticate(token)
         except Exception as e:
             print("[MW] auth error:", repr(e))
 
-        return await self.app(scope, receive, send)
\ No newline at end of file
+        return await self.app(scope, receive, send)
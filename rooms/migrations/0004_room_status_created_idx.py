@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0003_room_name_room_password'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['status', '-created_at'], name='room_status_created_idx'),
+        ),
+    ]
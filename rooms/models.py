@@ -87,5 +87,15 @@ class Room(models.Model):
     name = models.CharField(max_length=50, help_text="방 이름")  # 방 이름
     password = models.CharField(max_length=128, blank=True, null=True, help_text="비밀번호")  # 방 비밀번호 (없을 수도 있음)
 
+    class Meta:
+        indexes = [
+            # 로비 목록: status 하나로 거르고 created_at 역순 커서 페이지 (방 수와 무관하게 인덱스 범위 스캔)
+            models.Index(fields=["status", "-created_at"], name="room_status_created_idx"),
+            # 필터 없는 목록: created_at 역순 인덱스 스캔 (전체 정렬 없음).
+            # 한계: status 여러 개(IN)는 플래너가 위 복합 인덱스로 각 status 를 읽은 뒤 정렬할 수 있다 (SQLite 가 그렇다).
+            # 그 경우 비용은 고른 status 들의 방 수에 비례하므로, 방이 많으면 클라이언트는 status 하나씩 요청할 것
+            models.Index(fields=["-created_at"], name="room_created_idx"),
+        ]
+
     def __str__(self):
         return f"Room({self.id})"
\ No newline at end of file
@@ -0,0 +1,514 @@
+# rooms/presence.py
+# 방 presence.
+# - 멤버 변화는 버전(room:{id}:ver) 붙은 member_joined / member_left 증분으로만 방송한다.
+#   전체 목록(presence_snapshot)은 접속한 소켓에게만, 또는 클라이언트가 버전 틈을 발견해 요청할 때만 보낸다.
+# - 주기 브로드캐스트는 프로세스당 방 하나에 티커 하나, Redis 리스로 전체 워커 중 한 곳만 보낸다.
+#   (연결마다 티커를 돌리면 N명 방에서 틱마다 N번 group_send = N² 메시지)
+# - 연결마다 리스(room:{id}:leases, 만료 시각 점수의 ZSET)를 두고 티커가 틱마다 연장한다.
+#   워커가 죽어 disconnect 가 안 불려도 스위퍼가 만료된 리스를 정리하고 member_left 를 보낸다.
+# - 증분은 버전을 올리는 스크립트 안에서 room:{id}:deltas 리스트에 쌓는다 (리스트 순서 = 버전 순서).
+#   flush 리스를 잡은 워커 한 곳이 리스트를 통째로 꺼내 보내므로, 여러 워커가 있어도 배치마다 버전이 연속이다.
+import asyncio
+import json
+import math
+import time
+import uuid
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .redis_pool import CLAIM_LEASE, RELEASE_LEASE, LuaScript, get_sync_redis
+
+PROTOCOLS = ("delta", "count")
+
+def k_members(room_id):      return f"room:{room_id}:members"
+def k_conns(room_id, name):  return f"room:{room_id}:conns:{name}"
+def k_ver(room_id):          return f"room:{room_id}:ver"
+def k_ticker(room_id):       return f"room:{room_id}:ticker"
+def k_leases(room_id):       return f"room:{room_id}:leases"
+def k_deltas(room_id):       return f"room:{room_id}:deltas"
+def k_flush(room_id):        return f"room:{room_id}:flush"
+K_ROOMS = "presence:rooms"      # 리스가 있는 방 목록 (스위퍼 순회용)
+K_SWEEPER = "presence:sweeper"  # 스위퍼 리더 리스
+
+DEFAULTS = {
+    "LEASE_SEC": 15,     # 하트비트가 끊기고 이만큼 지나면 퇴장 처리 (하트비트는 이 시간에 세 번 이상)
+    "VER_TTL_SEC": 86400,  # room:{id}:ver 유지 시간. 리스보다 훨씬 길게 (버전이 되돌아가면 클라이언트가 증분을 무시함)
+    "SWEEP_SEC": 5,      # 스위퍼 주기
+    "SWEEP_BATCH": 200,  # 방 하나에서 한 번에 정리할 최대 리스 수
+    "COALESCE_MS": 25,       # 입퇴장 증분을 모으는 창 (마지막 이벤트 후 이만큼 조용하면 전송, 0이면 즉시)
+    "COALESCE_MAX_MS": 100,  # 첫 이벤트 후 최대 지연
+}
+
+FLUSH_LEASE_MS = 2000    # 증분 전송 중 다른 워커가 끼어들지 못하게 잡는 리스 (전송이 끝나면 바로 반납)
+FLUSH_RETRY_SEC = 0.005  # 다른 워커가 전송 중이면 이만큼 쉬고 남은 증분을 다시 확인
+
+
+def presence_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "ROOM_PRESENCE", {})}
+
+
+def lease_id(name):
+    """연결 하나의 리스 멤버 ("<conn>:<name>")."""
+    return f"{uuid.uuid4().hex}:{name}"
+
+# 서버 시각(ms). 워커 간 시계 차이와 무관하게 리스 만료를 판단하도록 스크립트 안에서 읽는다
+NOW_MS = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+"""
+
+# 증분 하나를 deltas 리스트에 [kind, name, ver, count] 로 쌓는다. 버전을 올린 바로 그 스크립트에서만 부른다
+PUSH_DELTA = """
+local function push_delta(key, kind, name, ver, count, ttl)
+    redis.call('RPUSH', key, cjson.encode({kind, name, ver, count}))
+    redis.call('EXPIRE', key, ttl)
+end
+"""
+
+# 입장: 연결 리스 등록, 멀티탭 카운트 +1, 첫 탭이면 멤버 추가 + 버전 증가 + 증분 적재. {changed, ver, members} 를 한 번에 반환
+# KEYS: conns, members, ver, leases, rooms, deltas / ARGV: name, lease, lease_ms, ttl_sec, room_id, ver_ttl_sec
+JOIN = LuaScript(NOW_MS + PUSH_DELTA + """
+redis.call('ZADD', KEYS[4], now + tonumber(ARGV[3]), ARGV[2])
+redis.call('SADD', KEYS[5], ARGV[5])
+local n = redis.call('INCR', KEYS[1])
+local changed = 0
+local ver
+if n == 1 then
+    redis.call('SADD', KEYS[2], ARGV[1])
+    ver = redis.call('INCR', KEYS[3])
+    changed = 1
+    push_delta(KEYS[6], 'member_joined', ARGV[1], ver, redis.call('SCARD', KEYS[2]), ARGV[4])
+else
+    ver = tonumber(redis.call('GET', KEYS[3]) or '0')
+end
+for _, i in ipairs({1, 2, 4}) do
+    redis.call('EXPIRE', KEYS[i], ARGV[4])
+end
+redis.call('EXPIRE', KEYS[3], ARGV[6])
+return {changed, ver, redis.call('SMEMBERS', KEYS[2])}
+""")
+
+# 퇴장: 리스 제거, 멀티탭 카운트 -1, 마지막 탭이면 카운터 삭제 + 멤버 제거 + 버전 증가 + 증분 적재. {changed, ver, count}
+# 스위퍼가 이미 정리한 연결이면 (리스 없음) 아무것도 하지 않는다
+# KEYS: conns, members, ver, leases, rooms, deltas / ARGV: name, lease, room_id, ttl_sec
+LEAVE = LuaScript(PUSH_DELTA + """
+local changed = 0
+local ver
+if redis.call('ZREM', KEYS[4], ARGV[2]) == 1 then
+    local n = redis.call('DECR', KEYS[1])
+    if n <= 0 then
+        redis.call('DEL', KEYS[1])
+        if redis.call('SREM', KEYS[2], ARGV[1]) == 1 then
+            ver = redis.call('INCR', KEYS[3])
+            changed = 1
+            push_delta(KEYS[6], 'member_left', ARGV[1], ver, redis.call('SCARD', KEYS[2]), ARGV[4])
+        end
+    end
+end
+if not ver then
+    ver = tonumber(redis.call('GET', KEYS[3]) or '0')
+end
+if redis.call('ZCARD', KEYS[4]) == 0 then
+    redis.call('SREM', KEYS[5], ARGV[3])
+end
+return {changed, ver, redis.call('SCARD', KEYS[2])}
+""")
+
+# 하트비트: 이 워커의 연결 리스들을 연장하고 방 키 TTL 갱신.
+# 스위퍼가 이미 지운 연결(워커가 잠시 멈췄던 경우)은 다시 입장 처리 (증분 적재) → 다시 입장한 이름 수
+# KEYS: members, ver, leases, rooms, deltas, conns_1..n / ARGV: lease_ms, ttl_sec, room_id, ver_ttl_sec, lease_1, name_1, ...
+HEARTBEAT = LuaScript(NOW_MS + PUSH_DELTA + """
+local expire = now + tonumber(ARGV[1])
+local rejoined = 0
+for i = 1, (#ARGV - 4) / 2 do
+    local lease, name, ck = ARGV[3 + 2 * i], ARGV[4 + 2 * i], KEYS[5 + i]
+    if redis.call('ZADD', KEYS[3], expire, lease) == 1 then
+        redis.call('SADD', KEYS[4], ARGV[3])
+        if redis.call('INCR', ck) == 1 and redis.call('SADD', KEYS[1], name) == 1 then
+            local ver = redis.call('INCR', KEYS[2])
+            push_delta(KEYS[5], 'member_joined', name, ver, redis.call('SCARD', KEYS[1]), ARGV[2])
+            rejoined = rejoined + 1
+        end
+    end
+    redis.call('EXPIRE', ck, ARGV[2])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[3], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return rejoined
+""")
+
+# 스위퍼: 만료된 리스를 최대 batch 개 정리. 마지막 탭이 사라진 이름은 퇴장 처리 (증분 적재) → {정리한 리스 수, 퇴장 수}
+# 방이 완전히 비면 presence:rooms 에서 뺀다.
+# conns 키는 리스 멤버("<conn>:<name>")에서 이름을 꺼내 스크립트 안에서 만든다 (단일 Redis 전제)
+# KEYS: leases, members, ver, rooms, deltas / ARGV: batch, room_id, conns_prefix, ttl_sec
+SWEEP = LuaScript(NOW_MS + PUSH_DELTA + """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, tonumber(ARGV[1]))
+local left = 0
+for _, lease in ipairs(expired) do
+    redis.call('ZREM', KEYS[1], lease)
+    local name = string.sub(lease, string.find(lease, ':', 1, true) + 1)
+    local ck = ARGV[3] .. name
+    if redis.call('DECR', ck) <= 0 then
+        redis.call('DEL', ck)
+        if redis.call('SREM', KEYS[2], name) == 1 then
+            local ver = redis.call('INCR', KEYS[3])
+            push_delta(KEYS[5], 'member_left', name, ver, redis.call('SCARD', KEYS[2]), ARGV[4])
+            left = left + 1
+        end
+    end
+end
+if redis.call('ZCARD', KEYS[1]) == 0 and redis.call('SCARD', KEYS[2]) == 0 then
+    redis.call('SREM', KEYS[4], ARGV[2])
+end
+return {#expired, left}
+""")
+
+# 쌓인 증분을 전부 꺼내고 비운다 (flush 리스를 가진 워커만 부른다)
+DRAIN = LuaScript("""
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+if #items > 0 then
+    redis.call('DEL', KEYS[1])
+end
+return items
+""")
+
+
+def room_group(room_id):
+    return f"room_{room_id}"
+
+
+def default_protocol():
+    proto = getattr(settings, "ROOM_PRESENCE_PROTO", "delta")
+    return proto if proto in PROTOCOLS else "delta"
+
+
+def sort_members(names):
+    return sorted(names, key=lambda s: s.lower())  # 보기 좋게 정렬
+
+
+async def snapshot(redis, room_id):
+    """(ver, 정렬된 멤버 목록). 한 트랜잭션으로 읽어 버전과 목록이 어긋나지 않게."""
+    pipe = redis.pipeline(transaction=True)
+    pipe.get(k_ver(room_id))
+    pipe.smembers(k_members(room_id))
+    ver, names = await pipe.execute()
+    return int(ver or 0), sort_members(names)
+
+
+def _ttl(conf):
+    # 방 키 TTL: 리스 두 배. 방의 모든 워커가 죽어도 키가 영원히 남지 않는다
+    # (ver 는 VER_TTL_SEC: 만료되면 1부터 다시 세어 기존 클라이언트가 이후 증분을 모두 무시하게 됨)
+    return math.ceil(conf["LEASE_SEC"] * 2)
+
+
+def _lease_ms(conf):
+    return int(conf["LEASE_SEC"] * 1000)
+
+
+def heartbeats_per_tick(tick_sec, conf=None) -> int:
+    """틱 한 번에 리스를 몇 번 연장할지. 리스가 끝나기 전에 최소 세 번 연장되도록 LEASE_SEC 에서 정한다."""
+    conf = conf or presence_settings()
+    return max(1, math.ceil(tick_sec * 3 / conf["LEASE_SEC"]))
+
+
+async def join(redis, room_id, name, lease):
+    """(changed, ver, 정렬된 멤버 목록). 왕복 한 번."""
+    conf = presence_settings()
+    changed, ver, names = await JOIN(
+        redis,
+        [k_conns(room_id, name), k_members(room_id), k_ver(room_id), k_leases(room_id), K_ROOMS, k_deltas(room_id)],
+        [name, lease, _lease_ms(conf), _ttl(conf), room_id, conf["VER_TTL_SEC"]],
+    )
+    return bool(changed), int(ver), sort_members(names)
+
+
+async def leave(redis, room_id, name, lease):
+    """(changed, ver, count). 왕복 한 번."""
+    changed, ver, count = await LEAVE(
+        redis,
+        [k_conns(room_id, name), k_members(room_id), k_ver(room_id), k_leases(room_id), K_ROOMS, k_deltas(room_id)],
+        [name, lease, room_id, _ttl(presence_settings())],
+    )
+    return bool(changed), int(ver), int(count)
+
+
+async def heartbeat(redis, room_id, leases: dict):
+    """이 워커의 연결 리스 연장 {lease: name}. 스위퍼에게 지워졌다 되살아난 이름은 member_joined."""
+    if not leases:
+        return
+    conf = presence_settings()
+    names = list(leases.items())
+    rejoined = await HEARTBEAT(
+        redis,
+        [k_members(room_id), k_ver(room_id), k_leases(room_id), K_ROOMS, k_deltas(room_id),
+         *(k_conns(room_id, name) for _, name in names)],
+        [_lease_ms(conf), _ttl(conf), room_id, conf["VER_TTL_SEC"], *(x for pair in names for x in pair)],
+    )
+    if rejoined:
+        await publish_deltas(redis, room_id)
+
+
+async def sweep_room(redis, room_id, batch):
+    """만료 리스 한 배치 정리 + member_left 발행. 정리한 리스 수 반환."""
+    n, left = await SWEEP(
+        redis,
+        [k_leases(room_id), k_members(room_id), k_ver(room_id), K_ROOMS, k_deltas(room_id)],
+        [batch, room_id, k_conns(room_id, ""), _ttl(presence_settings())],
+    )
+    if left:
+        await publish_deltas(redis, room_id)
+    return int(n)
+
+
+def snapshot_payload(room_id, ver, members) -> dict:
+    return {
+        "type": "presence_snapshot",
+        "roomId": room_id,
+        "ver": ver,
+        "count": len(members),
+        "members": members,
+    }
+
+
+def count_payload(room_id, members) -> dict:
+    # 호환 모드: 기존 presence_count 형식 그대로
+    return {
+        "type": "presence_count",
+        "roomId": room_id,
+        "count": len(members),
+        "members": members,  # ✅ 사용자 이름들 같이 전송
+    }
+
+
+async def publish_deltas(redis, room_id):
+    """스크립트가 쌓아 둔 member_joined / member_left 전송 예약. 짧은 창 안의 증분은 방송 한 번으로 보낸다."""
+    conf = presence_settings()
+    if conf["COALESCE_MS"] <= 0:
+        await flush_deltas(redis, room_id)
+        return
+    batcher = _batchers.get(room_id)
+    if batcher is None:
+        batcher = _batchers[room_id] = DeltaBatcher(redis, room_id, conf)
+    batcher.pending += 1
+
+
+async def flush_deltas(redis, room_id):
+    """room:{id}:deltas 를 버전 순서대로 전송. flush 리스를 잡은 워커 한 곳만 꺼내 보내고 전송을 마친 뒤 반납한다.
+    리스를 못 잡으면 (다른 워커가 전송 중) 잠시 뒤 남은 증분이 있을 때만 다시 시도한다.
+    전송이 리스 안에서 끝나므로 다음 배치는 항상 앞 배치 뒤에 도착하고, 배치 사이에 버전 틈이 생기지 않는다."""
+    token = uuid.uuid4().hex
+    deadline = asyncio.get_running_loop().time() + FLUSH_LEASE_MS / 1000.0
+    while await redis.exists(k_deltas(room_id)):
+        if await CLAIM_LEASE(redis, [k_flush(room_id)], [token, FLUSH_LEASE_MS]):
+            try:
+                items = await DRAIN(redis, [k_deltas(room_id)])
+                if items:
+                    await send_deltas(room_id, [tuple(json.loads(item)) for item in items])
+            finally:
+                await RELEASE_LEASE(redis, [k_flush(room_id)], [token])
+            return
+        if asyncio.get_running_loop().time() > deadline:
+            return  # 전송하던 워커가 죽었어도 다음 이벤트나 티커가 이어서 보낸다
+        await asyncio.sleep(FLUSH_RETRY_SEC)
+
+
+async def send_deltas(room_id, events):
+    """증분 하나면 기존 member_joined/member_left, 여러 개면 presence_batch 하나. 직렬화는 여기서 한 번만."""
+    if len(events) == 1:
+        kind, name, ver, count = events[0]
+        payload = {"type": kind, "roomId": room_id, "name": name, "ver": ver, "count": count}
+    else:
+        _, _, ver, count = events[-1]  # 버전 순서로 쌓였으니 마지막이 최신
+        payload = {
+            "type": "presence_batch",
+            "roomId": room_id,
+            "ver": ver,
+            "count": count,
+            "events": [{"type": kind, "name": name, "ver": v} for kind, name, v, _ in events],
+        }
+    await get_channel_layer().group_send(room_group(room_id), {
+        "type": "room.presence_event",
+        "events": [(kind, name, v) for kind, name, v, _ in events],
+        "text": json.dumps(payload),
+    })
+
+
+class DeltaBatcher:
+    """방 하나의 전송 예약. 이 워커의 이벤트가 COALESCE_MS 동안 멈추거나 COALESCE_MAX_MS 가 지나면 flush.
+    모으는 곳은 Redis 리스트라서 다른 워커의 증분도 같은 배치에 들어간다."""
+
+    def __init__(self, redis, room_id, conf):
+        self.redis = redis
+        self.room_id = room_id
+        self.window = conf["COALESCE_MS"] / 1000.0
+        self.max_delay = max(conf["COALESCE_MAX_MS"], conf["COALESCE_MS"]) / 1000.0
+        self.pending = 0
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        try:
+            while True:
+                seen = self.pending
+                wait = min(self.window, deadline - loop.time())
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+                if self.pending == seen:
+                    break
+        finally:
+            # 전송 중에 들어오는 이벤트는 새 배처가 받는다
+            if _batchers.get(self.room_id) is self:
+                del _batchers[self.room_id]
+        try:
+            await flush_deltas(self.redis, self.room_id)
+        except Exception as e:
+            print(f"❌ presence 증분 전송 실패 room={self.room_id}: {e}")
+
+
+_batchers = {}
+
+
+async def broadcast_tick(redis, room_id):
+    """주기 브로드캐스트: 목록 없이 (ver, count) 만. 클라이언트는 ver 로 누락을 감지한다."""
+    pipe = redis.pipeline(transaction=True)
+    pipe.get(k_ver(room_id))
+    pipe.scard(k_members(room_id))
+    ver, count = await pipe.execute()
+    ver = int(ver or 0)
+    await get_channel_layer().group_send(room_group(room_id), {
+        "type": "room.presence_tick",
+        "ver": ver,
+        "text": json.dumps({"type": "presence_tick", "roomId": room_id, "ver": ver, "count": count}),
+    })
+
+
+class RoomTicker:
+    """방 하나의 주기 브로드캐스트 + 이 워커의 연결 리스 하트비트. 브로드캐스트는 리스를 가진 워커만 보낸다."""
+
+    def __init__(self, redis, room_id, tick_sec):
+        self.redis = redis
+        self.room_id = room_id
+        self.tick_sec = tick_sec
+        self.beats = heartbeats_per_tick(tick_sec)  # LEASE_SEC 이 짧으면 틱 사이에도 하트비트
+        self.lease_ms = int(tick_sec * 3 * 1000)  # 틱 두 번 놓쳐도 유지, 워커가 죽으면 곧 넘어감
+        self.token = uuid.uuid4().hex
+        self.leases = {}  # 이 워커의 연결 리스 {lease: name}
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        n = 0
+        try:
+            while True:
+                await asyncio.sleep(self.tick_sec / self.beats)
+                n += 1
+                try:
+                    # 연결 리스 연장은 워커마다, 브로드캐스트는 리스 가진 워커만
+                    await heartbeat(self.redis, self.room_id, dict(self.leases))
+                    if n % self.beats:
+                        continue
+                    owner = await CLAIM_LEASE(self.redis, [k_ticker(self.room_id)], [self.token, self.lease_ms])
+                    if owner:
+                        # 보내다 만 증분(전송 워커가 죽은 경우)을 먼저 내보내야 틱 ver 가 증분을 앞지르지 않는다
+                        await flush_deltas(self.redis, self.room_id)
+                        await broadcast_tick(self.redis, self.room_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"❌ presence tick 실패 room={self.room_id}: {e}")
+        except asyncio.CancelledError:
+            pass
+
+    async def stop(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        try:
+            await RELEASE_LEASE(self.redis, [k_ticker(self.room_id)], [self.token])
+        except Exception:
+            pass
+
+
+_tickers = {}
+
+
+def ticker_acquire(redis, room_id, tick_sec, lease, name) -> RoomTicker:
+    """이 프로세스의 방 티커에 연결 하나 등록 (없으면 시작)."""
+    ticker = _tickers.get(room_id)
+    if ticker is None:
+        ticker = _tickers[room_id] = RoomTicker(redis, room_id, tick_sec)
+    ticker.leases[lease] = name
+    ensure_sweeper(redis)
+    return ticker
+
+
+async def ticker_release(room_id, lease):
+    """연결 하나 해제. 마지막 로컬 연결이 나가면 티커 중지 + 리스 반납."""
+    ticker = _tickers.get(room_id)
+    if ticker is None:
+        return
+    ticker.leases.pop(lease, None)
+    if not ticker.leases:
+        del _tickers[room_id]
+        await ticker.stop()
+
+
+# ---------- HTTP (동기) ----------
+def live_counts(room_ids) -> dict:
+    """{room_id: 현재 인원} 을 SCARD 파이프라인 한 번으로. Redis 오류 시 값은 None."""
+    room_ids = list(room_ids)
+    if not room_ids:
+        return {}
+    try:
+        pipe = get_sync_redis().pipeline(transaction=False)
+        for room_id in room_ids:
+            pipe.scard(k_members(room_id))
+        return dict(zip(room_ids, pipe.execute()))
+    except Exception as e:
+        print(f"❌ 방 인원 조회 실패: {e}")
+        return dict.fromkeys(room_ids)
+
+
+# ---------- 스위퍼 ----------
+_sweeper = None
+
+
+def ensure_sweeper(redis):
+    """프로세스당 스위퍼 태스크 하나. 실제 정리는 presence:sweeper 리스를 가진 워커만."""
+    global _sweeper
+    loop = asyncio.get_running_loop()
+    if _sweeper is None or _sweeper.done() or _sweeper.get_loop() is not loop:
+        _sweeper = loop.create_task(_sweep_loop(redis))
+
+
+async def _sweep_loop(redis):
+    token = uuid.uuid4().hex
+    try:
+        while True:
+            conf = presence_settings()
+            await asyncio.sleep(conf["SWEEP_SEC"])
+            try:
+                if not await CLAIM_LEASE(redis, [K_SWEEPER], [token, int(conf["SWEEP_SEC"] * 3 * 1000)]):
+                    continue
+                started = time.monotonic()
+                swept = 0
+                async for room_id in redis.sscan_iter(K_ROOMS):
+                    # 한 배치가 꽉 찼으면 같은 방을 이어서 정리
+                    while True:
+                        n = await sweep_room(redis, room_id, conf["SWEEP_BATCH"])
+                        swept += n
+                        if n < conf["SWEEP_BATCH"]:
+                            break
+                if swept:
+                    print(f"🧹 presence 정리 {swept}건 ({(time.monotonic() - started) * 1000:.1f}ms)")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ presence sweep 실패: {e}")
+    except asyncio.CancelledError:
+        pass
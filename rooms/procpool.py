@@ -0,0 +1,48 @@
+# rooms/procpool.py
+# CPU 작업용 프로세스 풀 (비밀번호 해시 rooms/hashing.py, rendition 인코딩 game/ladder.py).
+# daphne 프로세스는 스레드를 쓰고 있으니 fork 대신 spawn.
+# 워커 하나가 죽으면 (OOM kill 등) executor 전체가 BrokenProcessPool 이 되므로 풀을 버리고 새로 만든다.
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class SpawnPool:
+    """처음 쓸 때 만드는 spawn ProcessPoolExecutor. workers 는 설정을 읽는 함수 (만들 때 호출)."""
+
+    def __init__(self, workers, initializer=None, initargs=()):
+        self.workers = workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self._executor = None
+
+    def get(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer,
+                initargs=self.initargs,
+            )
+        return self._executor
+
+    def discard(self, executor):
+        """깨진 풀을 버린다 (다른 요청이 이미 새 풀로 바꿨으면 그대로 둔다)."""
+        if self._executor is executor:
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn, *args):
+        """fn(*args) 를 풀에서 실행. 풀이 깨져 있으면 새 풀로 한 번 더 (fn 은 부작용 없는 계산이어야 함).
+        새 풀도 깨지면 BrokenProcessPool."""
+        loop = asyncio.get_running_loop()
+        for retry in (False, True):
+            executor = self.get()
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                print(f"❌ 프로세스 풀 깨짐 ({getattr(fn, '__name__', fn)}), 새 풀로 교체")
+                self.discard(executor)
+                if retry:
+                    raise
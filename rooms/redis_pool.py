@@ -0,0 +1,207 @@
+# rooms/redis_pool.py
+# presence / 스트림 퍼블리셔 슬롯용 Redis 클라이언트.
+# 이벤트 루프마다 BlockingConnectionPool 하나 (redis.asyncio 연결은 만든 루프에 묶여 있음).
+# ASGI lifespan 으로 시작 시 만들고 종료 시 닫는다. lifespan 을 보내지 않는 서버(daphne)에서는 첫 사용 때 만든다.
+import asyncio
+
+from django.conf import settings
+from redis import BlockingConnectionPool as SyncBlockingConnectionPool
+from redis import Redis as SyncRedis
+from redis.asyncio import BlockingConnectionPool, Redis
+
+DEFAULTS = {
+    "MAX_CONNECTIONS": 50,        # 루프(워커)당 최대 연결 수
+    "TIMEOUT": 5,                 # 풀이 꽉 찼을 때 연결을 기다리는 최대 시간 (초)
+    "SOCKET_TIMEOUT": 5,
+    "CONNECT_TIMEOUT": 2,
+    "HEALTH_CHECK_INTERVAL": 30,  # 이 시간 이상 놀던 연결은 쓰기 전에 PING
+    "SYNC_MAX_CONNECTIONS": 10,   # HTTP 뷰(동기)용 풀
+    "SYNC_SOCKET_TIMEOUT": 0.5,   # HTTP 응답을 붙잡지 않도록 짧게
+}
+
+
+def pool_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "REDIS_POOL", {})}
+
+
+def redis_url() -> str:
+    return getattr(settings, "REDIS_URL", "redis://127.0.0.1:6379/0")
+
+
+class MeteredPool(BlockingConnectionPool):
+    """연결 대기/오류 수를 세는 BlockingConnectionPool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self.acquired = 0
+        self.errors = 0
+
+    async def get_connection(self, *args, **kwargs):
+        self.waiting += 1
+        try:
+            conn = await super().get_connection(*args, **kwargs)
+        except BaseException:
+            self.errors += 1
+            raise
+        finally:
+            self.waiting -= 1
+        self.acquired += 1
+        return conn
+
+    def metrics(self) -> dict:
+        in_use = len(self._in_use_connections)
+        return {
+            "max_connections": self.max_connections,
+            "in_use": in_use,
+            "idle": len(self._available_connections),
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "errors": self.errors,
+        }
+
+
+class LuaScript:
+    """redis.register_script 래퍼. 본문 해시는 한 번만 계산하고 EVALSHA 로 호출한다
+    (서버 스크립트 캐시에 없으면 redis-py 가 SCRIPT LOAD 후 다시 시도). 클라이언트는 호출마다 넘긴다."""
+
+    def __init__(self, source):
+        self.source = source
+        self._script = None
+
+    async def __call__(self, redis, keys, args=()):
+        if self._script is None:
+            self._script = redis.register_script(self.source)
+        return await self._script(keys=list(keys), args=list(args), client=redis)
+
+
+# 워커 간 리스(티커/스위퍼/틱/퍼블리셔 슬롯 등). KEYS: lease / ARGV: token, ttl_ms
+# 획득/연장: 내 토큰이면 연장, 비어 있으면 획득 → 1 / 다른 토큰이 잡고 있으면 0
+CLAIM_LEASE = LuaScript("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+""")
+
+# 반납: 내 토큰일 때만 삭제. KEYS: lease / ARGV: token
+RELEASE_LEASE = LuaScript("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+def _create() -> Redis:
+    conf = pool_settings()
+    pool = MeteredPool.from_url(
+        redis_url(),
+        decode_responses=True,
+        max_connections=conf["MAX_CONNECTIONS"],
+        timeout=conf["TIMEOUT"],
+        socket_timeout=conf["SOCKET_TIMEOUT"],
+        socket_connect_timeout=conf["CONNECT_TIMEOUT"],
+        health_check_interval=conf["HEALTH_CHECK_INTERVAL"],
+    )
+    return Redis(connection_pool=pool)
+
+
+_clients = {}   # {event loop: Redis}
+_factory = None  # 벤치마크/테스트용 대체 클라이언트 팩토리
+_sync_factory = None
+
+
+def use_factory(factory, sync_factory=None):
+    """get_redis() 가 factory() 로, get_sync_redis() 가 sync_factory() 로 만든 클라이언트를 쓰도록 (예: fakeredis).
+    None 이면 기본 풀."""
+    global _factory, _sync_factory, _sync_client
+    _factory = factory
+    _sync_factory = sync_factory
+    _clients.clear()
+    _sync_client = None
+
+
+def get_redis() -> Redis:
+    """현재 이벤트 루프의 공유 클라이언트."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        for old in [lp for lp in _clients if lp.is_closed()]:
+            del _clients[old]
+        client = _clients[loop] = _factory() if _factory else _create()
+    return client
+
+
+async def startup():
+    client = get_redis()
+    try:
+        await client.ping()
+        print(f"✅ Redis 풀 준비 ({redis_url()})")
+    except Exception as e:
+        # Redis 가 늦게 떠도 서버는 뜨게 두고, 연결은 사용할 때 다시 시도
+        print(f"❌ Redis 연결 실패 (시작 시): {e}")
+
+
+async def shutdown():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def metrics() -> dict:
+    """루프별 풀 상태 합계 + 동기 풀 상태."""
+    out = {"loops": 0, "in_use": 0, "idle": 0, "waiting": 0, "acquired": 0, "errors": 0}
+    for client in list(_clients.values()):
+        pool = client.connection_pool
+        if not isinstance(pool, MeteredPool):
+            continue
+        out["loops"] += 1
+        for k, v in pool.metrics().items():
+            if k in out:
+                out[k] += v
+    if _sync_client is not None:
+        pool = _sync_client.connection_pool
+        out["sync_connections"] = len(getattr(pool, "_connections", ()))
+    return out
+
+
+# ---------- HTTP 뷰(동기) ----------
+_sync_client = None
+
+
+def get_sync_redis() -> SyncRedis:
+    """프로세스 공용 동기 클라이언트 (스레드 안전한 블로킹 풀)."""
+    global _sync_client
+    if _sync_client is None and _sync_factory is not None:
+        _sync_client = _sync_factory()
+    if _sync_client is None:
+        conf = pool_settings()
+        pool = SyncBlockingConnectionPool.from_url(
+            redis_url(),
+            decode_responses=True,
+            max_connections=conf["SYNC_MAX_CONNECTIONS"],
+            timeout=conf["SYNC_SOCKET_TIMEOUT"],
+            socket_timeout=conf["SYNC_SOCKET_TIMEOUT"],
+            socket_connect_timeout=conf["SYNC_SOCKET_TIMEOUT"],
+            health_check_interval=conf["HEALTH_CHECK_INTERVAL"],
+        )
+        _sync_client = SyncRedis(connection_pool=pool)
+    return _sync_client
+
+
+# ---------- ASGI lifespan ----------
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await startup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -1,6 +1,6 @@
 # accounts/serializers.py
 from rest_framework import serializers
-from django.contrib.auth.hashers import make_password, check_password
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth import get_user_model
 from rest_framework import generics, permissions
 
@@ -13,27 +13,25 @@ class SignupSerializer(serializers.ModelSerializer):
         extra_kwargs = {"password": {"write_only": True}}
 
     def create(self, validated_data):
-        # 비밀번호 해싱
-        validated_data["password"] = make_password(validated_data["password"])
+        # 비밀번호 해싱 (SignupView 는 프로세스 풀에서 미리 해시해 password_hash 로 넘김)
+        password_hash = validated_data.pop("password_hash", None)
+        validated_data["password"] = password_hash or make_password(validated_data["password"])
         return super().create(validated_data)
 
 
 class LoginSerializer(serializers.Serializer):
+    """입력 검증 + 사용자 조회. 비밀번호 확인은 LoginView 가 프로세스 풀에서 한다."""
     name = serializers.CharField()
     password = serializers.CharField(write_only=True)
 
     def validate(self, attrs):
         name = attrs.get("name")
-        password = attrs.get("password")
 
         try:
             user = User.objects.get(name=name)
         except User.DoesNotExist:
             raise serializers.ValidationError("No such user")
 
-        if not check_password(password, user.password):
-            raise serializers.ValidationError("Wrong password")
-
         attrs["user"] = user
         return attrs
 
@@ -56,6 +54,7 @@ class RoomCreateSerializer(serializers.ModelSerializer):
 class RoomDetailSerializer(serializers.ModelSerializer):
     roomId = serializers.CharField(source="id", read_only=True)
     host = serializers.CharField(source="host.name", read_only=True)
+    # 현재 접속 인원 "count" 는 캐시 뒤에서 뷰가 붙인다 (rooms/cache.py)
 
     class Meta:
         model = Room
@@ -0,0 +1,151 @@
+# rooms/sim.py
+# 방 단위 서버 틱. 클라이언트 입력({"type":"input","seq":N,"data":...})을 모아 틱마다 방송 한 번.
+# - 워커는 자기 소켓에서 받은 입력을 로컬 버퍼에 쌓고 틱마다 room:{id}:inputs 에 RPUSH.
+# - 틱 리스(room:{id}:sim)를 가진 워커 하나가 같은 스크립트 호출에서 목록을 통째로 꺼내
+#   {"type":"tick","tick","inputs","acks"} 하나로 방 전체에 보낸다. 입력이 없는 틱은 보내지 않는다.
+# 방 메시지 수는 플레이어 × 입력 수가 아니라 틱 속도에 비례한다.
+import asyncio
+import json
+import uuid
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .presence import room_group
+from .redis_pool import RELEASE_LEASE, LuaScript
+
+def k_inputs(room_id):  return f"room:{room_id}:inputs"
+def k_tick(room_id):    return f"room:{room_id}:tick"
+def k_sim(room_id):     return f"room:{room_id}:sim"
+
+DEFAULTS = {
+    "HZ": 20,                 # 틱 속도
+    "MAX_INPUT_BYTES": 1024,  # 입력 메시지 하나 최대 크기
+    "MAX_BUFFER": 1000,       # 틱 하나에 워커가 쌓아 둘 최대 입력 수 (넘치면 버림)
+    "IDLE_SEC": 10,           # 이 시간 동안 입력이 없으면 워커의 틱 루프 종료
+}
+
+# 한 번 호출로: 로컬 입력 RPUSH + 틱 리스 획득/연장(redis_pool.CLAIM_LEASE 와 같은 규칙) + (리스 보유 시) 목록 꺼내기
+# KEYS: inputs, tick, lease / ARGV: token, lease_ms, ttl_sec, item_1, ...
+# 반환: {owner, tick, items}  (입력이 없으면 tick 은 올리지 않음)
+TICK = LuaScript("""
+if #ARGV > 3 then
+    redis.call('RPUSH', KEYS[1], unpack(ARGV, 4))
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+local owner = 0
+if redis.call('GET', KEYS[3]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[3], ARGV[2])
+    owner = 1
+elseif redis.call('SET', KEYS[3], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    owner = 1
+end
+if owner == 0 then
+    return {0, 0, {}}
+end
+local items = redis.call('LRANGE', KEYS[1], 0, -1)
+if #items == 0 then
+    return {1, 0, {}}
+end
+redis.call('DEL', KEYS[1])
+local tick = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return {1, tick, items}
+""")
+
+def sim_settings() -> dict:
+    return {**DEFAULTS, **getattr(settings, "ROOM_SIM", {})}
+
+
+def parse_input(text, name, max_bytes):
+    """클라이언트 입력 → 저장용 JSON 문자열. 형식이 아니면 None."""
+    if len(text) > max_bytes:
+        return None
+    try:
+        msg = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(msg, dict) or msg.get("type") != "input" or not isinstance(msg.get("seq"), int):
+        return None
+    return json.dumps({"name": name, "seq": msg["seq"], "data": msg.get("data")}, separators=(",", ":"))
+
+
+class RoomSim:
+    """워커 한 곳의 방 틱 루프."""
+
+    def __init__(self, redis, room_id, conf):
+        self.redis = redis
+        self.room_id = room_id
+        self.interval = 1.0 / conf["HZ"]
+        self.lease_ms = max(int(self.interval * 5 * 1000), 500)
+        self.ttl = max(int(self.interval * 20), 5)  # 소유 워커가 죽어도 입력 목록이 남지 않게
+        self.max_buffer = conf["MAX_BUFFER"]
+        self.idle_ticks = int(conf["IDLE_SEC"] * conf["HZ"])
+        self.token = uuid.uuid4().hex
+        self.buffer = []
+        self.dropped = 0
+        self.task = asyncio.create_task(self._run())
+
+    def push(self, item):
+        if len(self.buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self.buffer.append(item)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_at = loop.time()
+        idle = 0
+        try:
+            while idle < self.idle_ticks:
+                next_at += self.interval
+                await asyncio.sleep(max(0.0, next_at - loop.time()))
+                items, self.buffer = self.buffer, []
+                try:
+                    owner, tick, drained = await TICK(
+                        self.redis,
+                        [k_inputs(self.room_id), k_tick(self.room_id), k_sim(self.room_id)],
+                        [self.token, self.lease_ms, self.ttl, *items],
+                    )
+                    if drained:
+                        await self._broadcast(int(tick), drained)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"❌ sim tick 실패 room={self.room_id}: {e}")
+                idle = 0 if items or drained else idle + 1
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if _sims.get(self.room_id) is self:
+                del _sims[self.room_id]
+            try:
+                await RELEASE_LEASE(self.redis, [k_sim(self.room_id)], [self.token])
+            except Exception:
+                pass
+
+    async def _broadcast(self, tick, items):
+        inputs = [json.loads(item) for item in items]
+        acks = {}
+        for inp in inputs:
+            if inp["seq"] > acks.get(inp["name"], -1):
+                acks[inp["name"]] = inp["seq"]
+        text = json.dumps({
+            "type": "tick",
+            "roomId": self.room_id,
+            "tick": tick,
+            "inputs": inputs,
+            "acks": acks,  # 이름별 이번 틱에 반영된 마지막 seq
+        }, separators=(",", ":"))
+        await get_channel_layer().group_send(room_group(self.room_id), {"type": "room.sim_tick", "text": text})
+
+
+_sims = {}
+
+
+def push_input(redis, room_id, item):
+    """입력 하나를 이 워커의 방 틱 루프에 넣는다 (없으면 시작)."""
+    sim = _sims.get(room_id)
+    if sim is None or sim.task.done():
+        sim = _sims[room_id] = RoomSim(redis, room_id, sim_settings())
+    sim.push(item)
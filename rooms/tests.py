@@ -1,3 +1,338 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from channels.layers import get_channel_layer
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, PBKDF2SHA1PasswordHasher
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import hashing, presence, redis_pool
+from .procpool import SpawnPool
+from .cache import K_GENERATION, cache_key
+from .models import Room, User
+from .jwt_ws_middleware import JWTQueryAuthMiddleware, authenticate, k_user_rev, token_cache
+from .presence import K_ROOMS, k_conns, k_deltas, k_flush, k_leases, k_members, k_ver, room_group
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401  presence Lua 스크립트 실행용
+except ImportError:
+    fakeredis = None
+
+
+@skipUnless(fakeredis, 'fakeredis[lua] 필요 (pip install "fakeredis[lua]")')
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    ROOM_PRESENCE={"LEASE_SEC": 15, "COALESCE_MS": 0},
+)
+class PresenceScriptTests(SimpleTestCase):
+    room = "r1"
+
+    def setUp(self):
+        self.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def listen(self):
+        layer = get_channel_layer()
+        channel = await layer.new_channel()
+        await layer.group_add(room_group(self.room), channel)
+        return layer, channel
+
+    async def expire(self, lease):
+        # 워커가 죽어 하트비트가 끊긴 연결: 리스 만료 시각을 과거로
+        await self.redis.zadd(k_leases(self.room), {lease: 0})
+
+    async def test_multi_tab_join_leave(self):
+        tab1, tab2 = presence.lease_id("alice"), presence.lease_id("alice")
+
+        self.assertEqual(await presence.join(self.redis, self.room, "alice", tab1), (True, 1, ["alice"]))
+        self.assertEqual(await presence.join(self.redis, self.room, "alice", tab2), (False, 1, ["alice"]))
+        self.assertEqual(await self.redis.get(k_conns(self.room, "alice")), "2")
+
+        # 탭 하나만 닫으면 멤버/버전 그대로
+        self.assertEqual(await presence.leave(self.redis, self.room, "alice", tab1), (False, 1, 1))
+        # 마지막 탭이 닫히면 퇴장 + 버전 증가 + 방 목록에서 제거
+        self.assertEqual(await presence.leave(self.redis, self.room, "alice", tab2), (True, 2, 0))
+        self.assertFalse(await self.redis.exists(k_conns(self.room, "alice")))
+        self.assertFalse(await self.redis.sismember(K_ROOMS, self.room))
+
+        # 이미 정리된 연결의 중복 leave 는 아무것도 바꾸지 않는다
+        self.assertEqual(await presence.leave(self.redis, self.room, "alice", tab2), (False, 2, 0))
+
+    async def test_sweep_evicts_crashed_lease(self):
+        alice, bob = presence.lease_id("alice"), presence.lease_id("bob")
+        await presence.join(self.redis, self.room, "alice", alice)
+        await presence.join(self.redis, self.room, "bob", bob)
+        await presence.flush_deltas(self.redis, self.room)  # 입장 증분은 컨슈머가 보낸 것으로
+        layer, channel = await self.listen()
+
+        await self.expire(bob)
+        self.assertEqual(await presence.sweep_room(self.redis, self.room, 100), 1)
+
+        self.assertEqual(await self.redis.smembers(k_members(self.room)), {"alice"})
+        self.assertFalse(await self.redis.exists(k_conns(self.room, "bob")))
+        self.assertEqual(await self.redis.get(k_ver(self.room)), "3")
+        event = json.loads((await layer.receive(channel))["text"])
+        self.assertEqual((event["type"], event["name"], event["ver"], event["count"]), ("member_left", "bob", 3, 1))
+
+        # 만료되지 않은 리스는 건드리지 않는다
+        self.assertEqual(await presence.sweep_room(self.redis, self.room, 100), 0)
+        self.assertTrue(await self.redis.sismember(K_ROOMS, self.room))
+
+    async def test_sweep_keeps_member_with_live_tab(self):
+        tab1, tab2 = presence.lease_id("alice"), presence.lease_id("alice")
+        await presence.join(self.redis, self.room, "alice", tab1)
+        await presence.join(self.redis, self.room, "alice", tab2)
+
+        await self.expire(tab1)
+        self.assertEqual(await presence.sweep_room(self.redis, self.room, 100), 1)
+        self.assertEqual(await self.redis.smembers(k_members(self.room)), {"alice"})
+        self.assertEqual(await self.redis.get(k_ver(self.room)), "1")
+
+    async def test_heartbeat_rejoins_after_sweep(self):
+        bob = presence.lease_id("bob")
+        await presence.join(self.redis, self.room, "bob", bob)
+        await self.expire(bob)
+        await presence.sweep_room(self.redis, self.room, 100)
+        self.assertFalse(await self.redis.sismember(K_ROOMS, self.room))
+        layer, channel = await self.listen()
+
+        # 멈췄던 워커가 돌아와 하트비트 → 다시 입장 처리
+        await presence.heartbeat(self.redis, self.room, {bob: "bob"})
+        self.assertEqual(await self.redis.smembers(k_members(self.room)), {"bob"})
+        self.assertEqual(await self.redis.get(k_conns(self.room, "bob")), "1")
+        self.assertTrue(await self.redis.sismember(K_ROOMS, self.room))
+        event = json.loads((await layer.receive(channel))["text"])
+        self.assertEqual((event["type"], event["name"], event["ver"], event["count"]), ("member_joined", "bob", 3, 1))
+
+        # 살아 있는 리스의 하트비트는 연장만
+        await presence.heartbeat(self.redis, self.room, {bob: "bob"})
+        self.assertEqual(await self.redis.get(k_ver(self.room)), "3")
+
+    async def test_version_outlives_room_keys(self):
+        await presence.join(self.redis, self.room, "alice", presence.lease_id("alice"))
+        self.assertLessEqual(await self.redis.ttl(k_members(self.room)), 30)
+        self.assertGreater(await self.redis.ttl(k_ver(self.room)), 3600)
+
+    async def test_deltas_from_workers_flush_in_version_order(self):
+        # 여러 워커의 입퇴장이 같은 리스트에 버전 순서로 쌓이고, 한 번의 flush 로 연속 배치가 된다
+        alice, bob = presence.lease_id("alice"), presence.lease_id("bob")
+        await presence.join(self.redis, self.room, "alice", alice)
+        await presence.join(self.redis, self.room, "bob", bob)
+        await presence.leave(self.redis, self.room, "alice", alice)
+        layer, channel = await self.listen()
+
+        await presence.flush_deltas(self.redis, self.room)
+        event = json.loads((await layer.receive(channel))["text"])
+        self.assertEqual((event["type"], event["ver"], event["count"]), ("presence_batch", 3, 1))
+        self.assertEqual(
+            [(e["type"], e["name"], e["ver"]) for e in event["events"]],
+            [("member_joined", "alice", 1), ("member_joined", "bob", 2), ("member_left", "alice", 3)],
+        )
+        self.assertFalse(await self.redis.exists(k_deltas(self.room)))
+
+    async def test_flush_waits_for_other_worker(self):
+        await presence.join(self.redis, self.room, "alice", presence.lease_id("alice"))
+        await self.redis.set(k_flush(self.room), "other-worker", px=10000)
+        layer, channel = await self.listen()
+
+        task = asyncio.create_task(presence.flush_deltas(self.redis, self.room))
+        await asyncio.sleep(0.05)
+        self.assertFalse(task.done())
+        # 다른 워커가 전송을 마치고 리스 반납 → 남은 증분을 이어서 보낸다
+        await self.redis.delete(k_flush(self.room))
+        await task
+        event = json.loads((await layer.receive(channel))["text"])
+        self.assertEqual((event["type"], event["name"], event["ver"]), ("member_joined", "alice", 1))
+
+
+class HeartbeatIntervalTests(SimpleTestCase):
+    def test_default_lease_heartbeats_every_tick(self):
+        self.assertEqual(presence.heartbeats_per_tick(2, {"LEASE_SEC": 15}), 1)
+
+    def test_short_lease_heartbeats_between_ticks(self):
+        # 리스 1초면 틱(2초) 사이에 6번 → 0.33초마다
+        self.assertEqual(presence.heartbeats_per_tick(2, {"LEASE_SEC": 1}), 6)
+        self.assertEqual(presence.heartbeats_per_tick(2, {"LEASE_SEC": 2}), 3)
+
+
+@skipUnless(fakeredis, 'fakeredis[lua] 필요 (pip install "fakeredis[lua]")')
+@override_settings(WS_JWT_AUTH={"CLAIMS_ONLY": True})
+class TokenCacheRevocationTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        redis_pool.use_factory(lambda: self.redis)
+        token_cache.clear()
+        token = AccessToken()
+        token["user_id"] = 7
+        self.token = str(token)
+
+    def tearDown(self):
+        redis_pool.use_factory(None)
+        token_cache.clear()
+
+    async def test_cache_hit(self):
+        first = await authenticate(self.token)
+        self.assertIs(await authenticate(self.token), first)
+
+    async def test_revoked_on_other_worker(self):
+        first = await authenticate(self.token)
+        # 다른 워커에서 비활성화 → 리비전만 오른다 (이 프로세스에는 signal 이 오지 않음)
+        await self.redis.incr(k_user_rev(7))
+        self.assertIsNot(await authenticate(self.token), first)
+        self.assertEqual(token_cache.get(self.token)[2], 1)
+
+    async def test_middleware_is_mounted(self):
+        from config.asgi import application
+
+        self.assertIsInstance(application.application_mapping["websocket"], JWTQueryAuthMiddleware)
+
+    async def test_middleware_sets_scope_user(self):
+        seen = {}
+
+        async def app(scope, receive, send):
+            seen["user"] = scope["user"]
+
+        middleware = JWTQueryAuthMiddleware(app)
+        await middleware({"type": "websocket", "query_string": f"token={self.token}".encode()}, None, None)
+        self.assertEqual(str(seen["user"].id), "7")
+        await middleware({"type": "websocket", "query_string": b"token=garbage"}, None, None)
+        self.assertFalse(seen["user"].is_authenticated)
+
+    async def test_redis_down_skips_cache(self):
+        await authenticate(self.token)
+
+        async def fail(*args, **kwargs):
+            raise ConnectionError("down")
+
+        self.redis.get = fail
+        await authenticate(self.token)
+        self.assertIsNone(token_cache.get(self.token))
+
+
+class RoomCacheKeyTests(SimpleTestCase):
+    def test_key_includes_host(self):
+        # 캐시된 next/previous 링크가 요청 호스트로 만든 절대 URL 이라 호스트가 다르면 다른 항목
+        factory = RequestFactory()
+        a = factory.get("/rooms/list/?status=lobby", HTTP_HOST="a.example.com")
+        b = factory.get("/rooms/list/?status=lobby", HTTP_HOST="b.example.com")
+        self.assertNotEqual(cache_key("list", 1, a), cache_key("list", 1, b))
+        self.assertEqual(cache_key("list", 1, a), cache_key("list", 1, factory.get("/rooms/list/?status=lobby", HTTP_HOST="a.example.com")))
+
+
+@skipUnless(fakeredis, 'fakeredis[lua] 필요 (pip install "fakeredis[lua]")')
+class RoomCacheTests(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        redis_pool.use_factory(None, lambda: self.redis)
+        self.addCleanup(redis_pool.use_factory, None)
+        cache.clear()
+        self.host = User.objects.create(name="host")
+        self.room = Room.objects.create(host=self.host, name="r")
+
+    def test_matching_etag_is_304(self):
+        first = self.client.get("/rooms/list/")
+        self.assertEqual(first.status_code, 200)
+        again = self.client.get("/rooms/list/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again["ETag"], first["ETag"])
+        self.assertEqual(self.client.get("/rooms/list/", HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_status_change_invalidates(self):
+        url = f"/rooms/{self.room.id}/"
+        self.assertEqual(self.client.get(url).json()["status"], "lobby")
+        gen = self.redis.get(K_GENERATION)
+
+        self.room.status = Room.Status.RUNNING
+        self.room.save()
+        self.assertEqual(int(self.redis.get(K_GENERATION)), int(gen) + 1)
+        # 다음 조회는 캐시를 거치지 않고 새 상태
+        self.assertEqual(self.client.get(url).json()["status"], "running")
+        self.assertEqual(self.client.get("/rooms/list/").json()["results"][0]["status"], "running")
+
+    def test_live_count_is_merged_after_cache(self):
+        url = f"/rooms/{self.room.id}/"
+        self.assertEqual(self.client.get(url).json()["count"], 0)
+        self.redis.sadd(k_members(self.room.id), "alice")
+        self.assertEqual(self.client.get(url).json()["count"], 1)
+
+
+def _crash_once(marker):
+    # 첫 호출은 워커를 죽인다 (OOM kill 흉내), 이후엔 정상
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return "ok"
+
+
+def _crash(marker):
+    os._exit(1)
+
+
+class SpawnPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.marker = os.path.join(self.tmp.name, "crashed")
+        self.pool = SpawnPool(lambda: 1, initializer=hashing._init_worker, initargs=("config.settings",))
+        self.addCleanup(lambda: self.pool._executor and self.pool._executor.shutdown())
+
+    async def test_broken_pool_is_replaced(self):
+        self.assertEqual(await self.pool.run(_crash_once, self.marker), "ok")
+        self.assertEqual(await self.pool.run(_crash_once, self.marker), "ok")
+
+    async def test_gives_up_after_one_retry(self):
+        with self.assertRaises(BrokenProcessPool):
+            await self.pool.run(_crash, self.marker)
+        self.assertIsNone(self.pool._executor)
+
+
+def low_cost_hash(hasher, password):
+    # 테스트용: 반복 횟수를 낮춘 해시 (검증 결과는 실제 해시와 같다)
+    return hasher().encode(password, hasher().salt(), iterations=1000)
+
+
+class AuthViewTests(TestCase):
+    def login(self, password):
+        return self.client.post("/rooms/login/", {"name": "alice", "password": password}, content_type="application/json")
+
+    def test_wrong_password(self):
+        User.objects.create(name="alice", password=low_cost_hash(PBKDF2PasswordHasher, "right"))
+        response = self.login("wrong")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"non_field_errors": ["Wrong password"]})
+
+    def test_outdated_hash_is_rewritten(self):
+        User.objects.create(name="alice", password=low_cost_hash(PBKDF2SHA1PasswordHasher, "pw"))
+        response = self.login("pw")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.json())
+        self.assertTrue(User.objects.get(name="alice").password.startswith("pbkdf2_sha256$"))
+
+    def test_rehash_skipped_when_overloaded(self):
+        old = low_cost_hash(PBKDF2SHA1PasswordHasher, "pw")
+        User.objects.create(name="alice", password=old)
+        # 검증은 끝났으니 재해시 자리가 없어도 로그인은 성공, 해시는 다음 로그인 때
+        with mock.patch.object(hashing, "make_password", side_effect=hashing.Overloaded):
+            response = self.login("pw")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(User.objects.get(name="alice").password, old)
+
+    @override_settings(AUTH_HASHING={"MAX_PENDING": 0})
+    def test_full_queue_is_429(self):
+        User.objects.create(name="alice", password=low_cost_hash(PBKDF2PasswordHasher, "pw"))
+        for response in (
+            self.login("pw"),
+            self.client.post("/rooms/signup/", {"name": "bob", "password": "pw"}, content_type="application/json"),
+        ):
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response["Retry-After"], "1")
+        self.assertFalse(User.objects.filter(name="bob").exists())
+
+    def test_signup_bad_json(self):
+        response = self.client.post("/rooms/signup/", "{", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
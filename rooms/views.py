@@ -1,9 +1,14 @@
-from rest_framework import generics
-from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
+import json
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework_simplejwt.tokens import RefreshToken
 
+from . import hashing
 from .serializers import SignupSerializer, LoginSerializer
 
 User = get_user_model()
@@ -16,38 +21,82 @@ def _tokens_for_user(user: User):
         "user": {"id": user.id, "name": user.name},
     }
 
-class SignupView(generics.CreateAPIView):
+def _request_data(request):
+    if request.content_type == "application/json":
+        return json.loads(request.body or b"{}")
+    return request.POST
+
+def _overloaded():
+    # 해시 대기열이 가득 참 → 잠시 후 재시도
+    return JsonResponse({"detail": "Too many auth requests, retry shortly."}, status=429, headers={"Retry-After": "1"})
+
+
+# 비밀번호 해시/검증은 프로세스 풀에서 (rooms/hashing.py), DB 는 sync_to_async 로
+@method_decorator(csrf_exempt, name="dispatch")
+class SignupView(View):
     """
     회원가입: 계정만 만들고 토큰은 발급하지 않음.
     """
-    queryset = User.objects.all()
-    serializer_class = SignupSerializer
-    permission_classes = [AllowAny]
-
-    def create(self, request, *args, **kwargs):
-        resp = super().create(request, *args, **kwargs)
-        # resp.data: {"id": ..., "name": ...}  (serializer가 password는 write_only)
-        return Response({"ok": True, "user": resp.data}, status=201)
+    async def post(self, request, *args, **kwargs):
+        try:
+            ser = SignupSerializer(data=_request_data(request))
+        except ValueError:
+            return JsonResponse({"detail": "JSON parse error"}, status=400)
+        if not await sync_to_async(ser.is_valid)():
+            return JsonResponse(ser.errors, status=400)
+        try:
+            encoded = await hashing.make_password(ser.validated_data["password"])
+        except hashing.Overloaded:
+            return _overloaded()
+        await sync_to_async(ser.save)(password_hash=encoded)
+        # ser.data: {"id": ..., "name": ...}  (serializer가 password는 write_only)
+        return JsonResponse({"ok": True, "user": ser.data}, status=201)
 
 
-class LoginView(generics.GenericAPIView):
+@method_decorator(csrf_exempt, name="dispatch")
+class LoginView(View):
     """
     로그인: 자격 검증 후 JWT(access/refresh) 발급.
+    해시 설정(알고리즘/반복 횟수)이 바뀐 계정은 로그인 성공 시 새 설정으로 다시 해시해 저장.
     """
-    serializer_class = LoginSerializer
-    permission_classes = [AllowAny]
+    async def post(self, request, *args, **kwargs):
+        try:
+            ser = LoginSerializer(data=_request_data(request))
+        except ValueError:
+            return JsonResponse({"detail": "JSON parse error"}, status=400)
+        if not await sync_to_async(ser.is_valid)():
+            return JsonResponse(ser.errors, status=400)
 
-    def post(self, request, *args, **kwargs):
-        ser = self.get_serializer(data=request.data)
-        ser.is_valid(raise_exception=True)
         user = ser.validated_data["user"]
-        return Response(_tokens_for_user(user), status=200)
+        password = ser.validated_data["password"]
+        try:
+            ok, must_update = await hashing.check_password(password, user.password)
+        except hashing.Overloaded:
+            return _overloaded()
+        if not ok:
+            return JsonResponse({"non_field_errors": ["Wrong password"]}, status=400)
+        if must_update:
+            await _upgrade_hash(user, password)
+        return JsonResponse(_tokens_for_user(user), status=200)
+
+
+async def _upgrade_hash(user, password):
+    # 재해시는 덤: 대기열이 가득 차면 건너뛰고 다음 로그인 때 다시 (검증은 이미 끝났으니 로그인은 성공)
+    try:
+        encoded = await hashing.make_password(password)
+    except hashing.Overloaded:
+        return
+    await User.objects.filter(pk=user.pk).aupdate(password=encoded)
 
 
 
 # rooms/views_room.py
 from rest_framework import generics, permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from . import cache as room_cache
 from .models import Room
+from .presence import live_counts
 from .serializers import RoomCreateSerializer, RoomDetailSerializer
 
 class RoomCreateView(generics.CreateAPIView):
@@ -62,15 +111,63 @@ class RoomCreateView(generics.CreateAPIView):
 class RoomDetailView(generics.RetrieveAPIView):
     """
     GET /rooms/<roomId>/   (JWT 필요)
-    응답: {"roomId","host","status","created_at"}
+    응답: {"roomId","host","status","created_at","name","count"}
+    캐시된 응답 + ETag (If-None-Match 가 맞으면 304)
     """
     permission_classes = [permissions.AllowAny]
-    queryset = Room.objects.all()
+    queryset = Room.objects.select_related("host")
     lookup_field = "id"
     serializer_class = RoomDetailSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        data = room_cache.cached("detail", request, lambda: dict(self.get_serializer(self.get_object()).data))
+        data = {**data, "count": live_counts([data["roomId"]])[data["roomId"]]}
+        return room_cache.conditional_response(request, data)
+
+
+class RoomCursorPagination(CursorPagination):
+    ordering = "-created_at"
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
 
 class RoomListView(generics.ListAPIView):
+    """
+    GET /rooms/list/?status=lobby[,running]&cursor=...&page_size=20
+    응답: {"next","previous","results":[...]}  (최신순 커서 페이지, host 는 같은 쿼리에서 JOIN)
+    각 방에 현재 인원 "count" 포함 (페이지 전체를 Redis 파이프라인 한 번으로 조회, 실패 시 null)
+    DB 부분은 캐시 (방 생성/수정 시 무효화), 응답에 ETag (If-None-Match 가 맞으면 304)
+    인덱스: status 하나면 (status, created_at) 범위 스캔, 필터 없음은 created_at 인덱스 스캔.
+    status 여러 개는 DB 에 따라 정렬이 붙을 수 있다 (rooms/models.py 참고)
+    """
     permission_classes = [permissions.AllowAny]         # 목록은 누구나 가능
-    queryset = Room.objects.all().order_by("-created_at")
-    serializer_class = RoomDetailSerializer
\ No newline at end of file
+    queryset = Room.objects.select_related("host")
+    serializer_class = RoomDetailSerializer
+    pagination_class = RoomCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        status = self.request.query_params.get("status")
+        if status:
+            statuses = [s for s in status.split(",") if s]
+            invalid = [s for s in statuses if s not in Room.Status.values]
+            if invalid:
+                raise ValidationError({"status": f"unknown status: {', '.join(invalid)}"})
+            queryset = queryset.filter(status__in=statuses)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        data = room_cache.cached("list", request, self._page_data)
+        counts = live_counts(r["roomId"] for r in data["results"])
+        data = {**data, "results": [{**r, "count": counts[r["roomId"]]} for r in data["results"]]}
+        return room_cache.conditional_response(request, data)
+
+    def _page_data(self):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        serializer = self.get_serializer(page, many=True)
+        return {
+            "next": self.paginator.get_next_link(),
+            "previous": self.paginator.get_previous_link(),
+            "results": [dict(r) for r in serializer.data],
+        }
\ No newline at end of file